@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+VU+ Stream EPG Refresh - Benchmark ohne Receiver
+
+Simuliert einen Enigma2-Receiver (OpenWebif + Stream-Server auf Port-8001-Art) auf localhost
+und misst den Refresher dagegen: Services/Minute, API-Requests, gestreamte Bytes und
+Laufzeit pro Phase. So lassen sich Performance-Änderungen ohne Box vergleichen.
+
+Usage: python vu_stream_benchmark.py [--services=120] [--duration=4.0] [--workers=auto]
+       python vu_stream_benchmark.py --serve   (nur Fake-Receiver starten)
+"""
+
+import sys
+import io
+import time
+import threading
+import contextlib
+import socketserver
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from xml.sax.saxutils import escape
+
+from vu_stream_epgrefresh import VUStreamEPGRefresher, RunMetrics, _canonical_ref, _crc32_mpeg
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """Wie http.server.ThreadingHTTPServer (erst ab Python 3.7)"""
+    daemon_threads = True
+
+def _bcd(value):
+    return (value // 10) << 4 | value % 10
+
+def _eit_event(event_id, start, duration, title):
+    """Ein EIT-Event mit Short-Event-Descriptor (Titel)"""
+    mjd = start // 86400 + 40587
+    seconds = start % 86400
+    name = title.encode('latin-1', 'replace')[:64]
+    descriptor = bytes([0x4D, 5 + len(name)]) + b'deu' + bytes([len(name)]) + name + b'\x00'
+    return (event_id.to_bytes(2, 'big') + mjd.to_bytes(2, 'big')
+            + bytes([_bcd(seconds // 3600), _bcd(seconds // 60 % 60), _bcd(seconds % 60)])
+            + bytes([_bcd(duration // 3600), _bcd(duration // 60 % 60), _bcd(duration % 60)])
+            + (0x4000 | len(descriptor)).to_bytes(2, 'big') + descriptor)
+
+def _eit_section(table_id, sid, tsid, onid, section_number, last_section, segment_last, last_table_id, events):
+    """Komplette EIT-Section inkl. CRC"""
+    payload = (sid.to_bytes(2, 'big') + bytes([0xC1 | (1 << 1), section_number, last_section])
+               + tsid.to_bytes(2, 'big') + onid.to_bytes(2, 'big') + bytes([segment_last, last_table_id])
+               + b''.join(events))
+    length = len(payload) + 4
+    section = bytes([table_id, 0xF0 | length >> 8, length & 0xFF]) + payload
+    return section + _crc32_mpeg(section).to_bytes(4, 'big')
+
+def _packetize(section, pid=0x12):
+    """Section in TS-Pakete aufteilen (Continuity-Counter wird beim Senden gesetzt)"""
+    data = b'\x00' + section  # pointer_field
+    packets = []
+    first = True
+    while data:
+        chunk, data = data[:184], data[184:]
+        header = bytes([0x47, (0x40 if first else 0x00) | pid >> 8, pid & 0xFF, 0x10])
+        packets.append(header + chunk + b'\xff' * (184 - len(chunk)))
+        first = False
+    return packets
+
+class FakeReceiver:
+    """Simulierter Enigma2-Receiver: OpenWebif-API und TS-Stream-Server auf localhost
+
+    - `services` Kanäle im Bouquet, `per_transponder` pro Transponder
+    - `scrambled` zusätzliche verschlüsselte Kanäle (eigene Transponder, keine EIT)
+    - `with_epg` Anteil der Transponder, die schon EPG haben
+    - `latency` Verzögerung jeder API-Antwort in Sekunden
+    - `bitrate` Stream-Datenrate in KB/s, `tuners` max. gleichzeitige Streams (sonst 503)
+    - `epg_delay` Sekunden nach Stream-Start, bis das EPG des Transponders sichtbar ist
+    - `eit` EIT (PID 0x12) im Stream mitsenden
+    """
+    BOUQUET_NAME = 'Benchmark (TV)'
+    BOUQUET_REF = '1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "userbouquet.benchmark.tv" ORDER BY bouquet'
+    EVENTS_PER_SERVICE = 8
+    EVENT_DURATION = 3600
+    EIT_INTERVAL = 8            # Jedes 8. Paket im Stream ist EIT
+    PACKETS_PER_CHUNK = 64
+    MAX_STREAM_SECONDS = 60
+
+    def __init__(self, services=120, per_transponder=6, scrambled=0, with_epg=0.0, latency=0.0,
+                 bitrate=2000, tuners=4, epg_delay=1.0, eit=True):
+        self.latency = latency
+        self.bitrate = bitrate
+        self.tuners = tuners
+        self.epg_delay = epg_delay
+        self.eit = eit
+
+        self.services = []
+        for index in range(services):
+            tsid = index // per_transponder + 1
+            sid = tsid * 0x100 + index % per_transponder + 1
+            self.services.append(self._service(sid, tsid, f'Kanal {index + 1:03d}', False))
+        transponders = (services - 1) // per_transponder + 1 if services else 0
+        for index in range(scrambled):
+            tsid = transponders + index + 1
+            self.services.append(self._service(tsid * 0x100 + 1, tsid, f'Pay {index + 1:03d}', True))
+        self._by_ref = {_canonical_ref(service['ref']): service for service in self.services}
+
+        # EPG-Zustand pro Transponder: Zeitpunkt ab dem das EPG sichtbar ist (None = noch keins)
+        self._epg_ready = {}
+        tsids = sorted(set(service['tsid'] for service in self.services if not service['scrambled']))
+        for tsid in tsids[:int(len(tsids) * with_epg)]:
+            self._epg_ready[tsid] = 0
+
+        self._event_start = int(time.time()) // 3600 * 3600
+        self._lock = threading.Lock()
+        self._active_streams = 0
+        self.counters = {'api_requests': 0, 'api_connections': 0, 'streams': 0, 'streams_rejected': 0, 'stream_bytes': 0}
+        self._servers = []
+        self.port = None
+        self.stream_port = None
+
+    @staticmethod
+    def _service(sid, tsid, name, scrambled):
+        ref = f'1:0:19:{sid:X}:{tsid:X}:1:C00000:0:0:0:'
+        return {'ref': ref, 'name': name, 'sid': sid, 'tsid': tsid, 'scrambled': scrambled}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def start(self):
+        """API- und Stream-Server auf freien Ports starten"""
+        for stream in (False, True):
+            server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler(stream))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+        self.port = self._servers[0].server_address[1]
+        self.stream_port = self._servers[1].server_address[1]
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def _handler(self, stream):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                if not stream:
+                    receiver._count('api_connections')
+
+            def do_GET(self):
+                if stream:
+                    receiver._serve_stream(self)
+                else:
+                    receiver._serve_api(self)
+
+        return Handler
+
+    # --- OpenWebif ---
+
+    def _has_epg(self, service):
+        ready = self._epg_ready.get(service['tsid'])
+        return ready is not None and ready <= time.time()
+
+    def _all_events(self, service):
+        """Programm eines Services: (event_id, start, titel)"""
+        return [(index + 1, self._event_start + index * self.EVENT_DURATION, f"{service['name']} Sendung {index + 1}")
+                for index in range(self.EVENTS_PER_SERVICE)]
+
+    def _events(self, service, start=None, end=None):
+        """Für die API sichtbare Events (leer solange der Receiver kein EPG hat)"""
+        if not self._has_epg(service):
+            return []
+        return [(event_id, begin, title) for event_id, begin, title in self._all_events(service)
+                if (start is None or begin + self.EVENT_DURATION > start) and (end is None or begin < end)]
+
+    @staticmethod
+    def _event_xml(service, event_id, start, duration, title):
+        return (f'<e2event><e2eventid>{event_id}</e2eventid><e2eventstart>{start}</e2eventstart>'
+                f'<e2eventduration>{duration}</e2eventduration><e2eventtitle>{escape(title)}</e2eventtitle>'
+                f'<e2eventservicereference>{escape(service["ref"])}</e2eventservicereference>'
+                f'<e2eventservicename>{escape(service["name"])}</e2eventservicename></e2event>')
+
+    def _serve_api(self, handler):
+        self._count('api_requests')
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/web/getservices':
+            if 'sRef' not in query:
+                items = [(self.BOUQUET_REF, self.BOUQUET_NAME)]
+            elif query['sRef'] == self.BOUQUET_REF:
+                items = [(service['ref'], service['name']) for service in self.services]
+            else:
+                items = []
+            body = '<?xml version="1.0" encoding="UTF-8"?><e2servicelist>' + ''.join(
+                f'<e2service><e2servicereference>{escape(ref)}</e2servicereference>'
+                f'<e2servicename>{escape(name)}</e2servicename></e2service>' for ref, name in items) + '</e2servicelist>'
+        elif url.path == '/web/epgservice':
+            service = self._by_ref.get(_canonical_ref(query.get('sRef', '')))
+            events = self._events(service) if service else []
+            body = '<e2eventlist>' + ''.join(
+                self._event_xml(service, event_id, start, self.EVENT_DURATION, title) for event_id, start, title in events) + '</e2eventlist>'
+        elif url.path in ('/web/epgnownext', '/web/epgmulti'):
+            if query.get('bRef') != self.BOUQUET_REF:
+                body = '<e2eventlist></e2eventlist>'
+            else:
+                parts = []
+                for service in self.services:
+                    if url.path == '/web/epgnownext':
+                        events = self._events(service)[:2]
+                        if not events:
+                            # OpenWebif liefert für Services ohne EPG einen leeren Eintrag
+                            parts.append(f'<e2event><e2eventid>None</e2eventid><e2eventstart>None</e2eventstart>'
+                                         f'<e2eventservicereference>{escape(service["ref"])}</e2eventservicereference></e2event>')
+                    else:
+                        start = int(query['time']) if query.get('time', '').isdigit() else None
+                        end = int(query['endTime']) if query.get('endTime', '').isdigit() else None
+                        events = self._events(service, start, end)
+                    parts.extend(self._event_xml(service, event_id, begin, self.EVENT_DURATION, title)
+                                 for event_id, begin, title in events)
+                body = '<e2eventlist>' + ''.join(parts) + '</e2eventlist>'
+        elif url.path == '/web/deviceinfo':
+            body = '<e2deviceinfo><e2frontends>' + ''.join(
+                f'<e2frontend><e2name>Tuner {chr(65 + index)}</e2name></e2frontend>' for index in range(self.tuners)) + '</e2frontends></e2deviceinfo>'
+        else:
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        data = body.encode('utf-8')
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/xml; charset=UTF-8')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    # --- Stream-Server ---
+
+    def _eit_packets(self, tsid):
+        """EIT-Karussell (Now/Next + Schedule) aller Services eines Transponders als TS-Pakete"""
+        packets = []
+        for service in self.services:
+            if service['tsid'] != tsid:
+                continue
+            events = [_eit_event(event_id, start, self.EVENT_DURATION, title)
+                      for event_id, start, title in self._all_events(service)]
+            sid = service['sid']
+            for number in (0, 1):
+                packets += _packetize(_eit_section(0x4E, sid, tsid, 1, number, 1, 1, 0x4E, events[number:number + 1]))
+            last_section = (len(events) - 1) // 2
+            for number in range(last_section + 1):
+                packets += _packetize(_eit_section(0x50, sid, tsid, 1, number, last_section, last_section, 0x50,
+                                                   events[number * 2:number * 2 + 2]))
+        return packets
+
+    def _serve_stream(self, handler):
+        service = self._by_ref.get(_canonical_ref(unquote(urlparse(handler.path).path[1:])))
+        if service is None:
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        with self._lock:
+            if self._active_streams >= self.tuners:
+                self.counters['streams_rejected'] += 1
+                busy = True
+            else:
+                self._active_streams += 1
+                self.counters['streams'] += 1
+                busy = False
+        if busy:
+            handler.send_response(503)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        try:
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'video/mpeg')
+            handler.send_header('Connection', 'close')
+            handler.end_headers()
+            self._stream(handler, service)
+        except OSError:
+            pass  # Client hat den Stream beendet
+        finally:
+            with self._lock:
+                self._active_streams -= 1
+
+    def _stream(self, handler, service):
+        tsid = service['tsid']
+        if not service['scrambled']:
+            with self._lock:
+                # EPG erscheint erst nach `epg_delay` - wie beim Receiver, der die EIT erst verarbeitet
+                if self._epg_ready.get(tsid) is None:
+                    self._epg_ready[tsid] = time.time() + self.epg_delay
+
+        eit_packets = self._eit_packets(tsid) if self.eit and not service['scrambled'] else []
+        # Video-Füllpakete (PID 0x100), verschlüsselt mit transport_scrambling_control = 10
+        filler = bytes([0x47, 0x01, 0x00, 0x90 if service['scrambled'] else 0x10]) + b'\x55' * 184
+
+        chunk_size = self.PACKETS_PER_CHUNK * 188
+        bytes_per_second = self.bitrate * 1024
+        start_time = time.monotonic()
+        sent = 0
+        eit_index = 0
+        continuity = 0
+
+        while time.monotonic() - start_time < self.MAX_STREAM_SECONDS:
+            packets = []
+            for index in range(self.PACKETS_PER_CHUNK):
+                if eit_packets and index % self.EIT_INTERVAL == 0:
+                    packet = eit_packets[eit_index % len(eit_packets)]
+                    packets.append(packet[:3] + bytes([0x10 | continuity]) + packet[4:])
+                    continuity = (continuity + 1) & 0x0F
+                    eit_index += 1
+                else:
+                    packets.append(filler)
+            handler.wfile.write(b''.join(packets))
+            sent += chunk_size
+            self._count('stream_bytes', chunk_size)
+
+            # Datenrate einhalten
+            ahead = sent / bytes_per_second - (time.monotonic() - start_time)
+            if ahead > 0:
+                time.sleep(ahead)
+
+def _timed_analysis(services, timings, start_time):
+    """Reicht die Services der Pipeline durch und merkt sich, wann die Analyse fertig ist"""
+    yield from services
+    timings['analysis'] = time.monotonic() - start_time
+
+def run_benchmark(receiver_options=None, refresher_options=None, duration=4.0, pipeline=True, verbose=False):
+    """Ein Benchmark-Lauf gegen einen frischen Fake-Receiver - gibt die Messwerte als dict zurück"""
+    receiver = FakeReceiver(**(receiver_options or {})).start()
+    try:
+        metrics = RunMetrics('127.0.0.1', label='benchmark')
+        refresher = VUStreamEPGRefresher('127.0.0.1', port=receiver.port, stream_port=receiver.stream_port,
+                                         force_mode=True, pipeline=pipeline, metrics=metrics, **(refresher_options or {}))
+        timings = {}
+        output = sys.stdout if verbose else io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start_time = time.monotonic()
+            if pipeline:
+                services = _timed_analysis(refresher.iter_services_without_epg('Benchmark'), timings, start_time)
+            else:
+                services = refresher.find_services_without_epg('Benchmark')
+                timings['analysis'] = time.monotonic() - start_time
+            refresh_start = time.monotonic()
+            refresher.stream_based_epg_refresh(services, duration)
+            end_time = time.monotonic()
+
+        total = end_time - start_time
+        return {
+            'services': len(receiver.services),
+            'refreshed': refresher.summary['services'],
+            'successful': refresher.summary['successful'],
+            'new_events': refresher.summary['new_events'],
+            'analysis': timings.get('analysis', 0.0),
+            # Pipeline: Refresh überlappt die Analyse, gezählt wird die Zeit danach
+            'refresh': end_time - (start_time + timings['analysis'] if pipeline and 'analysis' in timings else refresh_start),
+            'total': total,
+            'services_per_minute': refresher.summary['services'] / total * 60 if total else 0.0,
+            'api_requests': receiver.counters['api_requests'],
+            'api_connections': receiver.counters['api_connections'],
+            'streams': receiver.counters['streams'],
+            'streams_rejected': receiver.counters['streams_rejected'],
+            'stream_bytes': receiver.counters['stream_bytes'],
+            # Summierte Zeit pro Messgröße (über alle Worker, kann die Wall-Time übersteigen)
+            'phases': {name: histogram['sum'] for name, histogram in metrics.report()['histograms'].items()
+                       if histogram['unit'] == 'seconds'},
+        }
+    finally:
+        receiver.stop()
+
+def print_report(result, run=None):
+    print(f"\n📊 BENCHMARK{f' (Lauf {run})' if run else ''}")
+    print(f"  📺 Services: {result['services']}, Refresh nötig: {result['refreshed']}, erfolgreich: {result['successful']}")
+    print(f"  ⏱️ Analyse: {result['analysis']:.2f}s")
+    print(f"  ⏱️ Refresh: {result['refresh']:.2f}s")
+    print(f"  ⏱️ Gesamt: {result['total']:.2f}s")
+    print(f"  🚀 Services/Minute: {result['services_per_minute']:.0f}")
+    print(f"  🔁 API-Requests: {result['api_requests']} ({result['api_connections']} Verbindungen)")
+    print(f"  📡 Streams: {result['streams']} ({result['streams_rejected']} abgelehnt), {result['stream_bytes'] / 1024 / 1024:.1f}MB gestreamt")
+    print(f"  🎯 Neue EPG-Events: {result['new_events']}")
+    if result['phases']:
+        print("  ⏱️ Zeit pro Messgröße (Summe aller Worker):")
+        for name, seconds in sorted(result['phases'].items(), key=lambda item: -item[1]):
+            print(f"     {name:<17} {seconds:.2f}s")
+
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("VU+ Stream EPG Refresh - Benchmark ohne Receiver")
+        print()
+        print("Usage:")
+        print("  python vu_stream_benchmark.py [Parameter]")
+        print()
+        print("Fake-Receiver:")
+        print("  --services=N        Kanäle im Bouquet (Standard: 120)")
+        print("  --per-transponder=N Kanäle pro Transponder (Standard: 6)")
+        print("  --scrambled=N       Zusätzliche verschlüsselte Kanäle (Standard: 0)")
+        print("  --with-epg=F        Anteil der Transponder mit EPG, 0.0-1.0 (Standard: 0.0)")
+        print("  --latency=S         Verzögerung jeder API-Antwort (Standard: 0.0)")
+        print("  --bitrate=KB        Stream-Datenrate in KB/s (Standard: 2000)")
+        print("  --tuners=N          Tuner = max. gleichzeitige Streams (Standard: 4)")
+        print("  --epg-delay=S       EPG erscheint S Sekunden nach Stream-Start (Standard: 1.0)")
+        print("  --no-eit            Keine EIT im Stream")
+        print("  --serve             Nur den Fake-Receiver starten (Ctrl+C beendet)")
+        print()
+        print("Refresher:")
+        print("  --duration=X        Max. Stream-Duration (Standard: 4.0)")
+        print("  --workers=N|auto    Parallele Streams (Standard: 1)")
+        print("  --poll[=S]          EPG während des Streams pollen")
+        print("  --no-dedup --no-bulk --no-sniff --no-pipeline")
+        print("  --repeat=N          Benchmark N-mal wiederholen (Standard: 1)")
+        print("  --verbose           Ausgabe des Refreshers anzeigen")
+        return
+
+    receiver_options = {}
+    refresher_options = {
+        'transponder_dedup': '--no-dedup' not in sys.argv,
+        'bulk_check': '--no-bulk' not in sys.argv,
+        'eit_sniff': '--no-sniff' not in sys.argv,
+        'poll_interval': 0.5 if '--poll' in sys.argv else None,
+    }
+    if '--no-eit' in sys.argv:
+        receiver_options['eit'] = False
+    duration = 4.0
+    repeat = 1
+
+    options = {
+        '--services=': ('services', int), '--per-transponder=': ('per_transponder', int),
+        '--scrambled=': ('scrambled', int), '--with-epg=': ('with_epg', float),
+        '--latency=': ('latency', float), '--bitrate=': ('bitrate', float),
+        '--tuners=': ('tuners', int), '--epg-delay=': ('epg_delay', float),
+    }
+    for arg in sys.argv[1:]:
+        try:
+            for prefix, (key, convert) in options.items():
+                if arg.startswith(prefix):
+                    receiver_options[key] = convert(arg.split('=')[1])
+            if arg.startswith('--duration='):
+                duration = float(arg.split('=')[1])
+            if arg.startswith('--repeat='):
+                repeat = max(1, int(arg.split('=')[1]))
+            if arg.startswith('--poll='):
+                refresher_options['poll_interval'] = float(arg.split('=')[1])
+            if arg.startswith('--workers='):
+                value = arg.split('=')[1]
+                refresher_options['workers'] = value if value == 'auto' else int(value)
+        except ValueError:
+            print(f"❌ Ungültiger Parameter: {arg}")
+            return
+
+    if '--serve' in sys.argv:
+        receiver = FakeReceiver(**receiver_options).start()
+        print(f"🖥️ Fake-Receiver: Web-Interface auf Port {receiver.port}, Streams auf Port {receiver.stream_port}")
+        print(f"📺 Bouquet: {receiver.BOUQUET_NAME} ({len(receiver.services)} Services)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            receiver.stop()
+        return
+
+    pipeline = '--no-pipeline' not in sys.argv
+    results = []
+    for run in range(1, repeat + 1):
+        result = run_benchmark(receiver_options, refresher_options, duration, pipeline=pipeline, verbose='--verbose' in sys.argv)
+        print_report(result, run if repeat > 1 else None)
+        results.append(result)
+
+    if repeat > 1:
+        best = min(results, key=lambda r: r['total'])
+        print(f"\n🏁 Bester Lauf: {best['total']:.2f}s, {best['services_per_minute']:.0f} Services/Minute")
+
+if __name__ == "__main__":
+    main()
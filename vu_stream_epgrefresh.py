@@ -18,113 +18,1330 @@ NEUE METHODE: Stream holen statt Zappen → Live-TV ungestört!
 - ✅ Verbesserte Stream-Validierung
 
 Usage: python vu_stream_epgrefresh.py <IP> bouquet <name> [--duration=4.0] [--force]
+       python vu_stream_epgrefresh.py --config=receivers.ini [--force]
 """
 
 # MINIMAL IMPORTS - nur was wirklich gebraucht wird
 import sys
-import urllib.request
+import urllib.error
+import http.client
+import socket
 import time
 import xml.etree.ElementTree as ET
 from urllib.parse import quote
 import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import io
 import base64
+import os
+import sqlite3
+import json
+import configparser
+import hashlib
+import asyncio
+import heapq
+import unicodedata
+from datetime import datetime
+
+# Optional: NumPy beschleunigt den PID-Filter über ganze Puffer (ohne NumPy reines Python)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _transponder_key(service_ref):
+    """Transponder-Schlüssel TSID:ONID:NS aus einer Service-Referenz (1:0:19:SID:TSID:ONID:NS:...)"""
+    parts = service_ref.split(':')
+    if len(parts) < 7 or parts[0] != '1':
+        return None
+
+    tsid, onid, namespace = parts[4], parts[5], parts[6]
+    # Ohne TSID/ONID (z.B. IPTV) lässt sich der Transponder nicht bestimmen
+    if not tsid.strip('0') and not onid.strip('0'):
+        return None
+
+    return f"{tsid}:{onid}:{namespace}".upper()
+
+def _canonical_ref(service_ref):
+    """Vergleichbare Form einer Service-Referenz (erste 10 Felder, Großschreibung)"""
+    return ':'.join(service_ref.strip().split(':')[:10]).upper()
+
+def _service_id(service_ref):
+    """Service-ID (SID) aus einer Service-Referenz, None wenn nicht lesbar"""
+    parts = service_ref.split(':')
+    try:
+        return int(parts[3], 16)
+    except (IndexError, ValueError):
+        return None
+
+def _split_bouquet_names(bouquet_name):
+    """Bouquet-Angabe ('Fav,HD' oder Liste) in einzelne Namen zerlegen"""
+    if isinstance(bouquet_name, str):
+        bouquet_name = bouquet_name.split(',')
+    return [name.strip() for name in bouquet_name if name.strip()]
+
+def _crc_entry(value):
+    crc = value << 24
+    for _ in range(8):
+        crc = (crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1
+    return crc & 0xFFFFFFFF
+
+_CRC_TABLE = [_crc_entry(value) for value in range(256)]
+
+def _crc32_mpeg(data):
+    """CRC-32/MPEG-2 der DVB-Sections (über eine Section inkl. CRC ergibt sich 0)"""
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = (crc << 8 & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+_output_label = threading.local()
+
+def _set_output_label(label):
+    """Label für alle Ausgaben des aktuellen Threads setzen (Multi-Receiver-Modus)"""
+    _output_label.value = label
+
+def _get_output_label():
+    return getattr(_output_label, 'value', None)
+
+def _with_output_label(func):
+    """`func` für einen Worker-Thread verpacken, der das Label des aufrufenden Threads übernimmt
+
+    (statt ThreadPoolExecutor(initializer=...), das erst ab Python 3.7 existiert)
+    """
+    label = _get_output_label()
+
+    def run(*args, **kwargs):
+        _set_output_label(label)
+        return func(*args, **kwargs)
+    return run
+
+class LabeledOutput:
+    """stdout-Ersatz, der jede Zeile mit dem Label des schreibenden Threads versieht
+
+    Im Multi-Receiver-Modus laufen mehrere Boxen gleichzeitig - so bleibt erkennbar,
+    welche Zeile zu welcher Box gehört. Zeilen werden pro Thread gepuffert und komplett
+    ausgegeben, damit sich parallele Ausgaben nicht vermischen.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._partial = threading.local()
+
+    def write(self, text):
+        buffered = getattr(self._partial, 'text', '') + text
+        *lines, self._partial.text = buffered.split('\n')
+        if lines:
+            label = _get_output_label()
+            prefix = f"[{label}] " if label else ''
+            with self._lock:
+                self._stream.write(''.join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            self._stream.flush()
+
+class EITSniffer:
+    """Verfolgt EIT-Sections (PID 0x12) im TS-Stream und erkennt, wann das EPG angekommen ist
+
+    Fertig ist der Stream, sobald für alle Ziel-Services Now/Next und alle Schedule-Sections
+    (laut last_section_number / segment_last_section_number / last_table_id) gesehen wurden,
+    oder sobald sich der EIT-Karussell wiederholt (nur noch bekannte Schedule-Sections).
+    Liefert der Receiver keine EIT im Stream, wird nie abgebrochen → --duration greift.
+    Nebenbei werden verschlüsselte Pakete (transport_scrambling_control) gezählt.
+    """
+    TS_PACKET_SIZE = 188
+    EIT_PID = 0x12
+    REPEAT_STREAK = 16  # Aufeinanderfolgende Wiederholungen = Karussell einmal komplett
+
+    def __init__(self, service_ids=(), harvest=None):
+        self.service_ids = set(sid for sid in service_ids if sid is not None)
+        self.harvest = harvest  # EITHarvest: neue Sections zusätzlich dekodieren (XMLTV)
+        self.eit_sections = 0
+        self.packets = 0
+        self.scrambled_packets = 0
+        self.done = False
+        self._remainder = b''
+        self._section = None
+        self._continuity = None
+        self._seen = set()
+        self._repeat_streak = 0
+        self._tables = {}       # (sid, table_id) -> {'last_section': n, 'segments': {seg: seg_last}, 'sections': set()}
+        self._last_table = {}   # (sid, base_table_id) -> last_table_id
+        self._present = set()   # SIDs mit Now/Next
+
+    def feed(self, data):
+        """Neue Stream-Daten verarbeiten - gibt True zurück sobald das EPG komplett ist
+
+        `data` darf ein memoryview auf einen wiederverwendeten Puffer sein: nur EIT-Pakete
+        und ein angebrochenes Paket am Ende werden kopiert.
+        """
+        view = memoryview(data)
+        size = self.TS_PACKET_SIZE
+        end = len(view)
+        pos = 0
+
+        # Angebrochenes Paket aus dem letzten Chunk vervollständigen
+        if self._remainder:
+            need = size - len(self._remainder)
+            if end < need:
+                self._remainder += bytes(view)
+                return self.done
+            packet = self._remainder + bytes(view[:need])
+            self._remainder = b''
+            if packet[0] == 0x47:
+                self.packets += 1
+                if packet[3] & 0xC0:
+                    self.scrambled_packets += 1
+                if ((packet[1] & 0x1F) << 8 | packet[2]) == self.EIT_PID:
+                    self._packet(packet)
+            pos = need
+
+        # NumPy: ganzer Puffer auf einmal, solange alle Pakete synchron sind
+        if numpy is not None and end - pos >= size * 8 and view[pos] == 0x47:
+            count = (end - pos) // size
+            packets = numpy.frombuffer(view[pos:pos + count * size], dtype=numpy.uint8).reshape(count, size)
+            if (packets[:, 0] == 0x47).all():
+                pids = (packets[:, 1].astype(numpy.uint16) & 0x1F) << 8 | packets[:, 2]
+                self.packets += count
+                self.scrambled_packets += int(numpy.count_nonzero(packets[:, 3] & 0xC0))
+                for index in numpy.flatnonzero(pids == self.EIT_PID).tolist():
+                    offset = pos + index * size
+                    self._packet(bytes(view[offset:offset + size]))
+                pos += count * size
+
+        packets = 0
+        scrambled = 0
+        while pos + size <= end:
+            if view[pos] != 0x47:
+                # Sync verloren: nächstes Sync-Byte suchen
+                pos += 1
+                continue
+
+            packets += 1
+            if view[pos + 3] & 0xC0:
+                scrambled += 1
+
+            # PID-Filter zuerst - der Rest ist nur für EIT interessant
+            if ((view[pos + 1] & 0x1F) << 8 | view[pos + 2]) == self.EIT_PID:
+                self._packet(bytes(view[pos:pos + size]))
+            pos += size
+
+        self.packets += packets
+        self.scrambled_packets += scrambled
+
+        # Rest nur ab einem Sync-Byte aufheben, damit das nächste Paket synchron beginnt
+        while pos < end and view[pos] != 0x47:
+            pos += 1
+        self._remainder = bytes(view[pos:])
+        return self.done
+
+    def is_scrambled(self, min_packets):
+        """True wenn nach `min_packets` Paketen fast alles verschlüsselt ist und keine EIT kam"""
+        return (self.packets >= min_packets and not self.eit_sections
+                and self.scrambled_packets * 10 >= self.packets * 9)
+
+    def _packet(self, packet):
+        """TS-Paket der EIT-PID in Sections zerlegen"""
+        payload_start = packet[1] & 0x40
+        adaptation = (packet[3] >> 4) & 0x03
+        continuity = packet[3] & 0x0F
+
+        if not adaptation & 0x01:
+            return  # Kein Payload
+
+        # Paketverlust → angefangene Section verwerfen
+        if self._continuity is not None and continuity != (self._continuity + 1) & 0x0F:
+            self._section = None
+        self._continuity = continuity
+
+        offset = 4
+        if adaptation & 0x02:
+            offset += 1 + packet[4]
+        payload = packet[offset:]
+        if not payload:
+            return
+
+        if payload_start:
+            pointer = payload[0]
+            if self._section is not None:
+                self._append(payload[1:1 + pointer])
+            self._section = None
+            rest = payload[1 + pointer:]
+
+            # Mehrere Sections können in einem Paket beginnen
+            while rest and rest[0] != 0xFF:
+                self._section = bytearray()
+                consumed = self._append(rest)
+                if self._section is not None:
+                    break  # Section geht im nächsten Paket weiter
+                rest = rest[consumed:]
+        elif self._section is not None:
+            self._append(payload)
+
+    def _append(self, data):
+        """Daten an die laufende Section hängen - gibt die verbrauchten Bytes zurück"""
+        section = self._section
+        section.extend(data)
+        if len(section) < 3:
+            return len(data)
+
+        length = 3 + (((section[1] & 0x0F) << 8) | section[2])
+        if len(section) < length:
+            return len(data)
+
+        consumed = len(data) - (len(section) - length)
+        self._section = None
+        self._handle_section(bytes(section[:length]))
+        return consumed
+
+    def _handle_section(self, section):
+        """EIT-Section-Header auswerten"""
+        table_id = section[0]
+        if not 0x4E <= table_id <= 0x6F or len(section) < 14:
+            return
+        self.eit_sections += 1
+
+        sid = (section[3] << 8) | section[4]
+        version = (section[5] >> 1) & 0x1F
+        section_number = section[6]
+        last_section_number = section[7]
+        segment_last_section_number = section[12]
+        last_table_id = section[13]
+
+        key = (sid, table_id, section_number, version)
+        is_schedule = table_id >= 0x50  # 0x4E/0x4F = Now/Next, 0x50-0x6F = Schedule
+        if key in self._seen:
+            if is_schedule:
+                self._repeat_streak += 1
+                if self._repeat_streak >= self.REPEAT_STREAK:
+                    self.done = True
+            return
+        self._seen.add(key)
+
+        if self.harvest is not None:
+            self.harvest.add_section(section)
+
+        if not is_schedule:
+            self._present.add(sid)
+        else:
+            self._repeat_streak = 0
+            table = self._tables.setdefault((sid, table_id), {'segments': {}, 'sections': set()})
+            table['last_section'] = last_section_number
+            table['segments'][section_number // 8] = segment_last_section_number
+            table['sections'].add(section_number)
+            base = 0x50 if table_id < 0x60 else 0x60
+            self._last_table[(sid, base)] = last_table_id
+
+        if self.service_ids and all(self._service_complete(target) for target in self.service_ids):
+            self.done = True
+
+    def _service_complete(self, sid):
+        """Now/Next und alle angekündigten Schedule-Sections eines Services gesehen?"""
+        if sid not in self._present:
+            return False
+
+        found_schedule = False
+        for base in (0x50, 0x60):
+            last_table_id = self._last_table.get((sid, base))
+            if last_table_id is None:
+                continue
+            found_schedule = True
+
+            for table_id in range(base, last_table_id + 1):
+                table = self._tables.get((sid, table_id))
+                if table is None:
+                    return False
+                for segment in range(table['last_section'] // 8 + 1):
+                    segment_last = table['segments'].get(segment)
+                    if segment_last is None:
+                        return False
+                    if any(n not in table['sections'] for n in range(segment * 8, segment_last + 1)):
+                        return False
+
+        return found_schedule
+
+class EITHarvest:
+    """Sammelt EPG-Events aus den EIT-Sections der Streams und schreibt sie als XMLTV
+
+    Dekodiert Startzeit (MJD/UTC), Dauer und Texte (Short/Extended Event Descriptor, DVB-Zeichensätze).
+    Exportiert werden nur Services, die über add_channel() bekannt sind (Bouquet-Inhalt).
+    """
+    CHARSETS = {0x01: 'iso-8859-5', 0x02: 'iso-8859-6', 0x03: 'iso-8859-7', 0x04: 'iso-8859-8',
+                0x05: 'iso-8859-9', 0x06: 'iso-8859-10', 0x07: 'iso-8859-11', 0x09: 'iso-8859-13',
+                0x0A: 'iso-8859-14', 0x0B: 'iso-8859-15', 0x11: 'utf-16-be', 0x12: 'euc-kr',
+                0x13: 'gb2312', 0x14: 'big5', 0x15: 'utf-8'}
+    # ISO 6937 (Standard ohne Zeichensatz-Byte): 0xC1-0xCF sind Akzente VOR dem Grundbuchstaben
+    ISO6937_DIACRITICS = {0xC1: '\u0300', 0xC2: '\u0301', 0xC3: '\u0302', 0xC4: '\u0303', 0xC5: '\u0304',
+                          0xC6: '\u0306', 0xC7: '\u0307', 0xC8: '\u0308', 0xC9: '\u0308', 0xCA: '\u030A',
+                          0xCB: '\u0327', 0xCD: '\u030B', 0xCE: '\u0328', 0xCF: '\u030C'}
+    # Abweichungen von Latin-1 (u.a. 0xFB = ß), alle anderen Bytes wie Latin-1
+    ISO6937_CHARS = {0xA4: '$', 0xA6: '#', 0xA8: '¤', 0xE0: 'Ω', 0xE1: 'Æ', 0xE2: 'Đ', 0xE3: 'ª', 0xE4: 'Ħ',
+                     0xE6: 'Ĳ', 0xE7: 'Ŀ', 0xE8: 'Ł', 0xE9: 'Ø', 0xEA: 'Œ', 0xEB: 'º', 0xEC: 'Þ', 0xED: 'Ŧ',
+                     0xEE: 'Ŋ', 0xEF: 'ŉ', 0xF0: 'ĸ', 0xF1: 'æ', 0xF2: 'đ', 0xF3: 'ð', 0xF4: 'ħ', 0xF5: 'ı',
+                     0xF6: 'ĳ', 0xF7: 'ŀ', 0xF8: 'ł', 0xF9: 'ø', 0xFA: 'œ', 0xFB: 'ß', 0xFC: 'þ', 0xFD: 'ŧ',
+                     0xFE: 'ŋ', 0xFF: '\xad'}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}  # (onid, tsid, sid) -> (channel_id, name)
+        self._events = {}    # (onid, tsid, sid, event_id) -> event
+        self.sections = 0
+        self.invalid_sections = 0
+
+    @staticmethod
+    def channel_id(service_ref):
+        """XMLTV-Kanal-ID im Picon-Stil: 1_0_19_283D_3FB_1_C00000_0_0_0"""
+        return '_'.join(_canonical_ref(service_ref).split(':')[:10])
+
+    def add_channel(self, service_ref, name):
+        parts = service_ref.split(':')
+        try:
+            key = (int(parts[5], 16), int(parts[4], 16), int(parts[3], 16))
+        except (IndexError, ValueError):
+            return
+        with self._lock:
+            self._channels[key] = (self.channel_id(service_ref), name)
+
+    @classmethod
+    def decode_text(cls, data):
+        """DVB-Text (EN 300 468 Annex A) dekodieren - ohne Zeichensatz-Byte gilt ISO 6937"""
+        if not data:
+            return ''
+        encoding = None
+        if data[0] == 0x10 and len(data) >= 3:
+            encoding = f'iso-8859-{data[2]}'
+            data = data[3:]
+        elif data[0] < 0x20:
+            encoding = cls.CHARSETS.get(data[0], 'latin-1')
+            data = data[1:]
+        if encoding is None:
+            text = cls._decode_iso6937(data)
+        else:
+            try:
+                text = bytes(data).decode(encoding, 'replace')
+            except LookupError:
+                text = bytes(data).decode('latin-1', 'replace')
+        # Steuerzeichen: 0x8A = Zeilenumbruch, 0x86/0x87 = Hervorhebung an/aus
+        text = text.replace('\x8a', '\n')
+        return ''.join(char for char in text if not ('\x80' <= char <= '\x9f') and (char >= ' ' or char == '\n')).strip()
+
+    @classmethod
+    def _decode_iso6937(cls, data):
+        """ISO 6937: Akzent-Byte + Buchstabe → kombinierendes Zeichen hinter den Buchstaben, dann NFC"""
+        chars = []
+        mark = ''
+        for byte in bytes(data):
+            if byte in cls.ISO6937_DIACRITICS:
+                mark = cls.ISO6937_DIACRITICS[byte]
+                continue
+            chars.append(cls.ISO6937_CHARS.get(byte, chr(byte)) + mark)
+            mark = ''
+        return unicodedata.normalize('NFC', ''.join(chars))
+
+    @staticmethod
+    def _bcd(value):
+        return (value >> 4) * 10 + (value & 0x0F)
+
+    def add_section(self, section):
+        """EIT-Section (inkl. CRC) dekodieren und Events übernehmen"""
+        if _crc32_mpeg(section) != 0:
+            self.invalid_sections += 1
+            return
+        sid = (section[3] << 8) | section[4]
+        tsid = (section[8] << 8) | section[9]
+        onid = (section[10] << 8) | section[11]
+
+        events = []
+        pos = 14
+        end = len(section) - 4
+        while pos + 12 <= end:
+            event_id = (section[pos] << 8) | section[pos + 1]
+            mjd = (section[pos + 2] << 8) | section[pos + 3]
+            hours, minutes, seconds = (self._bcd(value) for value in section[pos + 4:pos + 7])
+            duration = (self._bcd(section[pos + 7]) * 3600 + self._bcd(section[pos + 8]) * 60
+                        + self._bcd(section[pos + 9]))
+            loop_length = ((section[pos + 10] & 0x0F) << 8) | section[pos + 11]
+            descriptors = section[pos + 12:pos + 12 + loop_length]
+            pos += 12 + loop_length
+
+            if mjd == 0xFFFF:
+                continue  # Startzeit undefiniert
+            start = (mjd - 40587) * 86400 + hours * 3600 + minutes * 60 + seconds
+            event = {'start': start, 'stop': start + duration, 'title': '', 'subtitle': '', 'desc': '', 'lang': None}
+            extended = {}
+
+            index = 0
+            while index + 2 <= len(descriptors):
+                tag, length = descriptors[index], descriptors[index + 1]
+                body = descriptors[index + 2:index + 2 + length]
+                index += 2 + length
+                if tag == 0x4D and len(body) >= 5:  # Short Event: Titel + Kurztext
+                    event['lang'] = bytes(body[:3]).decode('latin-1', 'replace')
+                    name_length = body[3]
+                    event['title'] = self.decode_text(body[4:4 + name_length])
+                    text_start = 4 + name_length
+                    if text_start < len(body):
+                        event['subtitle'] = self.decode_text(body[text_start + 1:text_start + 1 + body[text_start]])
+                elif tag == 0x4E and len(body) >= 6:  # Extended Event: langer Text in Teilen
+                    items_length = body[4]
+                    text_start = 5 + items_length
+                    if text_start < len(body):
+                        extended[body[0] >> 4] = bytes(body[text_start + 1:text_start + 1 + body[text_start]])
+            if extended:
+                event['desc'] = self.decode_text(b''.join(extended[number] for number in sorted(extended)))
+            if event['title']:
+                events.append((event_id, event))
+
+        with self._lock:
+            self.sections += 1
+            for event_id, event in events:
+                self._events[(onid, tsid, sid, event_id)] = event
+
+    def programme_count(self):
+        with self._lock:
+            return sum(1 for key in self._events if key[:3] in self._channels)
+
+    def write_xmltv(self, path, merge=True):
+        """XMLTV schreiben - mit `merge` bleiben vorhandene Kanäle/Sendungen erhalten (neue haben Vorrang)"""
+        now = time.time()
+        channels = {}
+        programmes = {}
+
+        if merge and os.path.exists(path):
+            root = ET.parse(path).getroot()
+            for channel in root.findall('channel'):
+                channels[channel.get('id')] = channel
+            for programme in root.findall('programme'):
+                # Abgelaufene Sendungen fallen beim Merge heraus
+                try:
+                    if datetime.strptime(programme.get('stop', ''), '%Y%m%d%H%M%S %z').timestamp() < now:
+                        continue
+                except ValueError:
+                    pass
+                programmes[(programme.get('channel'), programme.get('start'))] = programme
+
+        with self._lock:
+            known = dict(self._channels)
+            events = [(known[key[:3]], event) for key, event in self._events.items() if key[:3] in known]
+
+        for (channel_id, name), event in events:
+            channel = ET.Element('channel', id=channel_id)
+            ET.SubElement(channel, 'display-name').text = name
+            channels[channel_id] = channel
+
+            start = time.strftime('%Y%m%d%H%M%S +0000', time.gmtime(event['start']))
+            programme = ET.Element('programme', start=start, stop=time.strftime('%Y%m%d%H%M%S +0000', time.gmtime(event['stop'])), channel=channel_id)
+            lang = {'lang': event['lang']} if event['lang'] else {}
+            ET.SubElement(programme, 'title', **lang).text = event['title']
+            if event['subtitle']:
+                ET.SubElement(programme, 'sub-title', **lang).text = event['subtitle']
+            if event['desc']:
+                ET.SubElement(programme, 'desc', **lang).text = event['desc']
+            programmes[(channel_id, start)] = programme
+
+        tv = ET.Element('tv', {'generator-info-name': 'vu_stream_epgrefresh'})
+        tv.extend(channels[channel_id] for channel_id in sorted(channels))
+        tv.extend(programmes[key] for key in sorted(programmes, key=lambda key: (key[0] or '', key[1] or '')))
+        if hasattr(ET, 'indent'):  # Python 3.9+
+            ET.indent(tv)
+
+        tmp_path = path + '.tmp'
+        ET.ElementTree(tv).write(tmp_path, encoding='utf-8', xml_declaration=True)
+        os.replace(tmp_path, path)
+        return len(programmes)
+
+class RefreshStateDB:
+    """Persistenter Refresh-Status pro Service (SQLite) für inkrementelle Läufe"""
+    FAILURE_OUTCOMES = ('stream_failed', 'no_epg')
+    DEAD_OUTCOMES = ('scrambled', 'no_data', 'http_error')  # Kein nutzbarer Stream → Negativ-Cache
+    BACKOFF_AFTER = 2             # Backoff ab dem 2. Fehlschlag in Folge
+    BACKOFF_BASE = 4 * 3600       # 4h, danach jeweils verdoppelt
+    BACKOFF_MAX = 7 * 24 * 3600   # Max. 1 Woche Pause
+    DEAD_TTL = 24 * 3600          # Tote Services sofort 24h auslassen, danach verdoppelt
+
+    COLUMNS = ('host', 'ref', 'name', 'last_refresh', 'outcome', 'bytes_drained',
+               'time_to_epg', 'horizon', 'failures', 'next_attempt')
+
+    def __init__(self, path, dead_ttl=DEAD_TTL):
+        self.path = path
+        self.dead_ttl = dead_ttl
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS services ('
+            ' host TEXT NOT NULL, ref TEXT NOT NULL, name TEXT,'
+            ' last_refresh REAL, outcome TEXT, bytes_drained INTEGER, time_to_epg REAL,'
+            ' horizon INTEGER, failures INTEGER NOT NULL DEFAULT 0, next_attempt REAL,'
+            ' PRIMARY KEY (host, ref))')
+        self._conn.commit()
+
+    def get(self, host, ref):
+        """Gespeicherter Status eines Services als dict (None wenn unbekannt)"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM services WHERE host = ? AND ref = ?',
+                (host, _canonical_ref(ref))).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def _store(self, state, commit=True):
+        self._conn.execute(
+            f'INSERT OR REPLACE INTO services ({", ".join(self.COLUMNS)}) VALUES ({", ".join("?" * len(self.COLUMNS))})',
+            tuple(state[column] for column in self.COLUMNS))
+        if commit:
+            self._conn.commit()
+
+    def _load_or_new(self, host, ref, name):
+        state = self.get(host, ref)
+        if state is None:
+            state = dict.fromkeys(self.COLUMNS)
+            state.update(host=host, ref=_canonical_ref(ref), failures=0)
+        state['name'] = name
+        return state
+
+    def update_horizons(self, host, entries):
+        """EPG-Abdeckung aus der Analyse merken (ohne Refresh-Ergebnis zu ändern)
+
+        `entries` sind (ref, name, horizon) - alle in einer Transaktion (ein fsync statt einem pro Service).
+        """
+        with self._lock:
+            for ref, name, horizon in entries:
+                if horizon is None:
+                    continue
+                state = self._load_or_new(host, ref, name)
+                state['horizon'] = horizon
+                self._store(state, commit=False)
+            self._conn.commit()
+
+    def record(self, host, ref, name, outcome, bytes_drained=None, time_to_epg=None, horizon=None):
+        """Ergebnis eines Refresh speichern - wiederholte Fehlschläge bekommen exponentiellen Backoff"""
+        now = time.time()
+        with self._lock:
+            state = self._load_or_new(host, ref, name)
+            if outcome == 'deferred':
+                # Nichts refresht → letzter Refresh, Bytes und Zeit bis EPG bleiben erhalten
+                state['outcome'] = outcome
+                self._store(state)
+                return
+            # Ein einzelner Header-Timeout kann auch ein langsamer Tuner-Lock sein (Rotor, Unicable)
+            # → erst der zweite 'no_data' in Folge gilt als tot, der erste bekommt normalen Backoff
+            unconfirmed = outcome == 'no_data' and state['outcome'] != 'no_data'
+            state.update(last_refresh=now, outcome=outcome, bytes_drained=bytes_drained, time_to_epg=time_to_epg)
+            if horizon is not None:
+                state['horizon'] = horizon
+
+            if outcome in self.FAILURE_OUTCOMES or unconfirmed:
+                state['failures'] = (state['failures'] or 0) + 1
+                if state['failures'] >= self.BACKOFF_AFTER:
+                    delay = self.BACKOFF_BASE * 2 ** (state['failures'] - self.BACKOFF_AFTER)
+                    state['next_attempt'] = now + min(delay, self.BACKOFF_MAX)
+            elif outcome in self.DEAD_OUTCOMES:
+                # Negativ-Cache: schon beim ersten Mal auslassen, bei erneutem Fehlschlag länger
+                state['failures'] = (state['failures'] or 0) + 1
+                if self.dead_ttl:
+                    delay = self.dead_ttl * 2 ** max(0, state['failures'] - (2 if outcome == 'no_data' else 1))
+                    state['next_attempt'] = now + min(delay, self.BACKOFF_MAX)
+            elif outcome == 'ok':
+                state['failures'] = 0
+                state['next_attempt'] = None
+
+            self._store(state)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class TransponderStats:
+    """Gelernte Zeit bis zum neuen EPG pro Transponder (kleine JSON-Datei)"""
+    MIN_SAMPLES = 3      # Erst ab 3 Messungen wird die gelernte Duration verwendet
+    MAX_SAMPLES = 20     # Nur die letzten Messungen zählen
+    MARGIN = 0.5         # Sicherheitszuschlag auf das p90 in Sekunden
+    MIN_DURATION = 0.5
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._samples = json.load(f).get('transponders', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Statistik-Datei unlesbar ({e}) - starte neu")
+
+    def record(self, key, seconds):
+        """Gemessene Zeit bis zum EPG für einen Transponder merken"""
+        if key is None or seconds is None:
+            return
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append(round(seconds, 2))
+            del samples[:-self.MAX_SAMPLES]
+
+    def duration_for(self, key, max_duration):
+        """p90 der bisherigen Messungen plus Zuschlag, begrenzt durch `max_duration` (None = unbekannt)"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, []))
+        if key is None or len(samples) < self.MIN_SAMPLES:
+            return None
+
+        p90 = samples[max(0, -(-len(samples) * 9 // 10) - 1)]
+        return min(max(p90 + self.MARGIN, self.MIN_DURATION), max_duration)
+
+    def save(self):
+        with self._lock:
+            _write_atomic(self.path, json.dumps({'version': 1, 'transponders': self._samples}, indent=1, sort_keys=True))
+
+class TopologyCache:
+    """Bouquets und Service-Listen pro Receiver auf Platte (JSON) mit Änderungserkennung
+
+    Die Bouquet-Liste wird bei jedem Lauf geladen (ein kleiner Request) und per Hash mit dem
+    Cache verglichen. Solange sie unverändert ist und die Service-Listen jünger als `ttl_hours`
+    sind, entfällt das Laden und Parsen der Bouquets komplett. Ältere Listen werden neu geladen,
+    aber nur bei geändertem Hash neu geparst.
+    """
+    TTL_HOURS = 6
+
+    def __init__(self, path, ttl_hours=TTL_HOURS):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._hosts = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._hosts = json.load(f).get('hosts', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Topologie-Cache unlesbar ({e}) - starte neu")
+
+    @staticmethod
+    def digest(content):
+        """Hash einer Service-Liste aus /web/getservices"""
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def bouquets(self, host, digest):
+        """Gecachte Bouquets [(ref, name)] wenn die Bouquet-Liste unverändert ist, sonst None"""
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry.get('bouquets_hash') != digest:
+                return None
+            return [tuple(item) for item in entry['bouquets']]
+
+    def store_bouquets(self, host, digest, bouquets):
+        """Neue Bouquet-Liste merken - Service-Listen verschwundener Bouquets fallen weg"""
+        with self._lock:
+            entry = self._hosts.setdefault(host, {'services': {}})
+            refs = {ref for ref, _ in bouquets}
+            entry['services'] = {ref: value for ref, value in entry.get('services', {}).items() if ref in refs}
+            entry['bouquets_hash'] = digest
+            entry['bouquets'] = [list(item) for item in bouquets]
+
+    def services(self, host, bouquet_ref, digest=None):
+        """Gecachte Services [(ref, name)] eines Bouquets
+
+        Ohne `digest` nur wenn die Liste jünger als die TTL ist, mit `digest` nur wenn der Hash
+        passt (dann gilt die Liste wieder als frisch). Sonst None.
+        """
+        with self._lock:
+            cached = self._hosts.get(host, {}).get('services', {}).get(bouquet_ref)
+            if cached is None:
+                return None
+            if digest is None:
+                if time.time() - cached['fetched'] >= self.ttl:
+                    return None
+            elif cached['hash'] != digest:
+                return None
+            else:
+                cached['fetched'] = time.time()
+            return [tuple(item) for item in cached['services']]
+
+    def store_services(self, host, bouquet_ref, digest, services):
+        """Frisch geparste Service-Liste eines Bouquets merken"""
+        with self._lock:
+            entry = self._hosts.setdefault(host, {'services': {}})
+            entry.setdefault('services', {})[bouquet_ref] = {
+                'hash': digest,
+                'fetched': time.time(),
+                'services': [list(item) for item in services],
+            }
+
+    def save(self):
+        with self._lock:
+            _write_atomic(self.path, json.dumps({'version': 1, 'hosts': self._hosts}, indent=1, sort_keys=True))
+
+class RunMetrics:
+    """Zeitmessungen eines Laufs pro Receiver: Histogramme pro Messgröße und Werte pro Service
+
+    Messgrößen in Sekunden (außer drain_throughput in KB/s): bouquet_lookup, bouquet_services,
+    bulk_epg, epg_check, stream_connect, first_byte, drain, drain_throughput, time_to_epg, sleep.
+    Pro Service werden wiederholte Messungen (z.B. mehrere EPG-Checks) aufsummiert.
+    """
+    SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    THROUGHPUT_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+    UNITS = {'drain_throughput': 'kbps'}
+    MAX_VALUES = 10000   # Perzentile aus den letzten Messungen (Daemon), Zähler und Summen bleiben komplett
+
+    def __init__(self, host, label=None):
+        self.host = host
+        self.label = label or host
+        self.started = time.time()
+        self.finished = None
+        self.summary = {}
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._services = {}
+
+    def observe(self, name, value, service=None):
+        """Messwert in das Histogramm `name` eintragen (und dem Service zuordnen)"""
+        if value is None:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                buckets = self.THROUGHPUT_BUCKETS if name in self.UNITS else self.SECONDS_BUCKETS
+                histogram = self._histograms[name] = {'buckets': buckets, 'counts': [0] * len(buckets),
+                                                      'count': 0, 'sum': 0.0, 'values': []}
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+                    break
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['values'].append(value)
+            del histogram['values'][:-self.MAX_VALUES]
+
+            if service is not None:
+                entry = self._service_entry(service)
+                entry[name] = round(entry.get(name, 0.0) + value, 4)
+
+    def service(self, service, **fields):
+        """Ergebnis-Felder eines Services setzen (outcome, bytes, events, ...)"""
+        with self._lock:
+            self._service_entry(service).update(fields)
+
+    def _service_entry(self, service):
+        key = _canonical_ref(service['ref'])
+        entry = self._services.get(key)
+        if entry is None:
+            entry = self._services[key] = {'ref': service['ref'], 'name': service['name']}
+        return entry
+
+    def finish(self, summary):
+        self.finished = time.time()
+        self.summary = dict(summary)
+
+    def report(self):
+        """Lauf als dict (für den JSON-Report)"""
+        with self._lock:
+            histograms = {}
+            for name, histogram in sorted(self._histograms.items()):
+                values = sorted(histogram['values'])
+                cumulative = list(itertools.accumulate(histogram['counts']))
+                histograms[name] = {
+                    'unit': self.UNITS.get(name, 'seconds'),
+                    'count': histogram['count'],
+                    'sum': round(histogram['sum'], 4),
+                    'min': round(values[0], 4),
+                    'p50': round(values[(len(values) - 1) // 2], 4),
+                    'p90': round(values[max(0, -(-len(values) * 9 // 10) - 1)], 4),
+                    'max': round(values[-1], 4),
+                    'buckets': {str(bound): count for bound, count in zip(histogram['buckets'], cumulative)},
+                }
+            services = list(self._services.values())
+        finished = self.finished or time.time()
+        return {'receiver': self.label, 'host': self.host, 'started': self.started, 'finished': finished,
+                'wall_time': round(finished - self.started, 3), 'summary': self.summary,
+                'histograms': histograms, 'services': services}
+
+    def prometheus_lines(self):
+        """Metriken im Prometheus-Textformat (ohne HELP/TYPE-Zeilen) - [(metric, type, line)]"""
+        report = self.report()
+        escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"')
+        labels = f'receiver="{escape(self.label)}",host="{escape(self.host)}"'
+        summary = report['summary']
+        lines = [
+            ('vu_epgrefresh_last_run_timestamp_seconds', 'gauge', f"{{{labels}}} {report['finished']:.0f}"),
+            ('vu_epgrefresh_run_duration_seconds', 'gauge', f"{{{labels}}} {report['wall_time']}"),
+        ]
+        for key in ('services', 'successful', 'new_events', 'stream_sessions', 'transponders'):
+            lines.append((f'vu_epgrefresh_{key}', 'gauge', f"{{{labels}}} {summary.get(key, 0)}"))
+        if summary.get('services'):
+            lines.append(('vu_epgrefresh_success_ratio', 'gauge', f"{{{labels}}} {summary['successful'] / summary['services']:.4f}"))
+
+        for name, histogram in report['histograms'].items():
+            metric = f"vu_epgrefresh_{name}_{histogram['unit']}"
+            for bound, count in histogram['buckets'].items():
+                lines.append((metric, 'histogram', f'_bucket{{{labels},le="{bound}"}} {count}'))
+            lines.append((metric, 'histogram', f'_bucket{{{labels},le="+Inf"}} {histogram["count"]}'))
+            lines.append((metric, 'histogram', f"_sum{{{labels}}} {histogram['sum']}"))
+            lines.append((metric, 'histogram', f"_count{{{labels}}} {histogram['count']}"))
+        return lines
+
+def _write_atomic(path, text):
+    """Datei atomar schreiben (erst temporäre Datei, dann umbenennen)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_run_report(path, metrics_list):
+    """JSON-Report aller Receiver eines Laufs schreiben"""
+    data = {'version': 1, 'generated': time.time(), 'receivers': [metrics.report() for metrics in metrics_list]}
+    _write_atomic(path, json.dumps(data, indent=1, ensure_ascii=False))
+
+def write_prometheus_textfile(path, metrics_list):
+    """Metriken für den node_exporter Textfile-Collector schreiben (*.prom)"""
+    grouped = {}
+    for metrics in metrics_list:
+        for metric, metric_type, line in metrics.prometheus_lines():
+            grouped.setdefault((metric, metric_type), []).append(metric + line)
+
+    text = []
+    for (metric, metric_type), lines in grouped.items():
+        text.append(f"# TYPE {metric} {metric_type}")
+        text.extend(lines)
+    _write_atomic(path, '\n'.join(text) + '\n')
 
 class VUStreamEPGRefresher:
-    def __init__(self, host, username=None, password=None, port=80, force_mode=False, debug_mode=False, skip_strings=[]):
+    API_POOL_SIZE = 8  # Max. offene Keep-Alive-Verbindungen zum Web-Interface
+    DRAIN_CHUNK_SIZE = 16384  # BUGFIX: 16KB Chunks für bessere Performance
+    STREAM_PORT = 8001
+    CONNECT_TIMEOUT = 3.0     # Verbindungsaufbau zum Stream-Server
+    FIRST_BYTE_TIMEOUT = 5.0  # Header + erste Daten (Tuner muss erst locken)
+    SCRAMBLED_PROBE_PACKETS = 2000  # ~370KB ohne EIT und fast alles verschlüsselt → Abbruch
+    EPG_CHECK_COST = 0.05     # Geschätzte Sekunden pro EPG-Check (Budget-Planer)
+    PLAN_HORIZON_HOURS = 24   # EPG-Abdeckung, ab der ein Service für den Planer "voll" ist
+    BULK_MARGIN_HOURS = 24    # Bulk-EPG liest bis Mindest-Abdeckung plus diese Reserve
+    EIT_GRACE = 3.0           # Nach komplettem EIT so lange auf den EPG-Cache der Box warten
+    EIT_GRACE_POLL = 0.3
+    FAILURE_LABELS = {'scrambled': '🔒 verschlüsselt', 'no_data': '⌛ keine Daten',
+                      'http_error': '🚫 HTTP-Fehler', 'connect_failed': '🔌 keine Verbindung', 'busy': '⏳ Tuner belegt'}
+    BUSY_RETRIES = 2         # Bei 5xx denselben Service nach kurzer Pause erneut versuchen
+    BUSY_RETRY_DELAY = 2.0
+
+    def __init__(self, host, username=None, password=None, port=80, force_mode=False, debug_mode=False, skip_strings=[], transponder_dedup=True, workers=1, bulk_check=True, eit_sniff=True, poll_interval=None, state_db=None, since_hours=None, min_horizon_hours=None, stats=None, pipeline=True, rate_limit=None,
+                 connect_timeout=CONNECT_TIMEOUT, first_byte_timeout=FIRST_BYTE_TIMEOUT, stream_port=STREAM_PORT,
+                 metrics=None, budget=None, harvest=None, topology=None):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
 
         self.base_url = f'http://{host}:{port}'  # Web-Interface
-        self.stream_base_url = f'http://{host}:8001'  # Stream-Server auf Port 8001
+        self.stream_port = stream_port
+        self.stream_base_url = f'http://{host}:{self.stream_port}'  # Stream-Server auf Port 8001
+
+        # Basic-Auth-Header einmalig berechnen
+        self._auth_header = None
+        if username and password:
+            credentials = f"{username}:{password}"
+            self._auth_header = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+
+        # Keep-Alive-Pool für das Web-Interface (Stream-Requests nutzen eigene Verbindungen)
+        self._api_connections = []
+        self._api_lock = threading.Lock()
 
         self.force_mode = force_mode
         self.debug_mode = debug_mode
         # Skip-Strings für Kanal-Namen
         self.skip_strings = skip_strings
+        # Nur ein Stream pro Transponder (EIT enthält alle Services des Mux)
+        self.transponder_dedup = transponder_dedup
+        # Parallele Stream-Worker (Zahl oder 'auto' = Tuner-Anzahl - 1)
+        self.workers = workers
+        self._resolved_workers = None
+        # Bouquet-weite EPG-Analyse über /web/epgnownext bzw. /web/epgmulti
+        self.bulk_check = bulk_check
+        # Stream beenden sobald die EIT-Sections im TS durch sind
+        self.eit_sniff = eit_sniff
+        # EPG während des Streams pollen (Sekunden, None = aus)
+        self.poll_interval = poll_interval
+        # Inkrementelle Läufe: Status-DB, kürzlich refreshte Services und Mindest-Abdeckung
+        self.state_db = state_db
+        self.since_hours = since_hours
+        self.min_horizon_hours = min_horizon_hours
+        # Gelernte Stream-Duration pro Transponder (TransponderStats oder None)
+        self.stats = stats
+        # Analyse und Stream-Refresh überlappen (nur mit --force, sonst fehlt die Gesamtzahl für die Bestätigung)
+        self.pipeline = pipeline
+        # Max. Empfangsrate pro Stream in KB/s (None = unbegrenzt)
+        self.rate_limit = rate_limit
+        # Kurze Timeouts: tote Services kosten Sekunden statt bis zu 20s
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout
+        self._drain_local = threading.local()
+        # Zeitmessungen für Report/Prometheus (RunMetrics oder None)
+        self.metrics = metrics
+        # Zeitbudget in Sekunden: wertvollste Transponder zuerst, Rest wird aufgeschoben
+        self.budget = budget
+        self._deadline = None
+        # EIT aus den Streams für den XMLTV-Export sammeln (EITHarvest oder None)
+        self.harvest = harvest
+        # Bouquets/Services auf Platte cachen, nur bei geänderter Kanalliste neu parsen (TopologyCache oder None)
+        self.topology = topology
+        self._topology_changed = False
+        self._print_lock = threading.Lock()
+        self._group_lock = threading.Lock()
+        self._transponder_sids = {}
+        # Ergebnis des letzten Laufs (für die Gesamt-Zusammenfassung im Multi-Receiver-Modus)
+        self.summary = {'services': 0, 'successful': 0, 'new_events': 0, 'stream_sessions': 0, 'transponders': 0, 'deferred': 0}
         
+    def _acquire_api_connection(self, timeout):
+        """Freie Keep-Alive-Verbindung aus dem Pool holen oder neue anlegen - (conn, reused)"""
+        with self._api_lock:
+            conn = self._api_connections.pop() if self._api_connections else None
+
+        if conn is None:
+            return http.client.HTTPConnection(self.host, self.port, timeout=timeout), False
+
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release_api_connection(self, conn, reusable=True):
+        """Verbindung zurück in den Pool legen (oder schließen wenn nicht wiederverwendbar)"""
+        if reusable:
+            with self._api_lock:
+                if len(self._api_connections) < self.API_POOL_SIZE:
+                    self._api_connections.append(conn)
+                    return
+        conn.close()
+
+    def _api_get(self, endpoint, timeout=10):
+        """GET auf das Web-Interface über den Keep-Alive-Pool - gibt (conn, response) zurück"""
+        headers = {'Connection': 'keep-alive', 'Accept-Encoding': 'identity'}
+        if self._auth_header:
+            headers['Authorization'] = self._auth_header
+
+        while True:
+            conn, reused = self._acquire_api_connection(timeout)
+            try:
+                conn.request('GET', endpoint, headers=headers)
+                response = conn.getresponse()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                # Vom Receiver geschlossene Keep-Alive-Verbindung → neu verbinden
+                if not reused:
+                    raise
+
+        if response.status >= 400:
+            response.read()
+            self._release_api_connection(conn, not response.will_close)
+            raise urllib.error.HTTPError(self.base_url + endpoint, response.status, response.reason, response.headers, None)
+
+        return conn, response
+
     def _make_request(self, endpoint, timeout=10):
-        """HTTP Request mit optionaler Basic Auth"""
+        """HTTP Request mit optionaler Basic Auth (Keep-Alive)"""
         try:
-            url = f'http://{self.host}:{self.port}' + endpoint
-            req = urllib.request.Request(url)
-            
-            # HTTP Basic Authentication hinzufügen falls vorhanden
-            if self.username and self.password:
-                credentials = f"{self.username}:{self.password}"
-                encoded = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
-                req.add_header('Authorization', f'Basic {encoded}')
-                print(f"{self.username}: {encoded}")
-                
-            response = urllib.request.urlopen(req, timeout=timeout)
+            conn, response = self._api_get(endpoint, timeout=timeout)
             content = response.read().decode('utf-8', errors='ignore')
+            self._release_api_connection(conn, not response.will_close)
             return {'success': True, 'content': content}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def find_services_without_epg(self, bouquet_name, max_events=0):
-        """Findet Services ohne EPG-Daten - UNLIMITED"""
-        print(f"🔍 Suche Services ohne EPG in '{bouquet_name}'...")
-        
-        # Bouquet finden
-        bouquets_result = self._make_request('/web/getservices')
-        if not bouquets_result['success']:
-            return []
-        
-        target_bouquet = None
+    def _count_epg_events(self, endpoint, limit=None, timeout=10, min_horizon=None):
+        """Zählt <e2event> inkrementell beim Lesen der Antwort und bricht ab sobald `limit` überschritten ist
+
+        Mit `min_horizon` (Unix-Zeit) wird zusätzlich gelesen, bis die Abdeckung diesen Zeitpunkt erreicht.
+        """
         try:
-            root = ET.fromstring(bouquets_result['content'])
-            for service in root.findall('.//e2service'):
-                service_ref_elem = service.find('e2servicereference')
-                service_name_elem = service.find('e2servicename')
-                
-                if service_ref_elem is not None and service_name_elem is not None:
-                    ref = service_ref_elem.text.strip()
-                    name = service_name_elem.text.strip()
-                    
-                    if ref.startswith('1:7:') and bouquet_name.lower() in name.lower():
-                        target_bouquet = ref
-                        print(f"  📺 Bouquet gefunden: {name}")
+            events = 0
+            horizon = None
+            truncated = False
+            parser = ET.XMLPullParser(events=('end',))
+
+            conn, response = self._api_get(endpoint, timeout=timeout)
+            try:
+                while not truncated:
+                    chunk = response.read(8192)
+                    if not chunk:
                         break
+                    parser.feed(chunk)
+
+                    for _, elem in parser.read_events():
+                        if elem.tag != 'e2event':
+                            continue
+                        events += 1
+
+                        # Abdeckung: Ende des spätesten Events (start + duration)
+                        start = (elem.findtext('e2eventstart') or '').strip()
+                        event_duration = (elem.findtext('e2eventduration') or '').strip()
+                        if start.isdigit():
+                            end = int(start) + (int(event_duration) if event_duration.isdigit() else 0)
+                            horizon = end if horizon is None else max(horizon, end)
+                        elem.clear()  # Speicher sofort freigeben
+
+                        # Früher Abbruch: Schwelle überschritten, Rest der Antwort wird nicht mehr gelesen
+                        if limit is not None and events > limit and (min_horizon is None or (horizon or 0) >= min_horizon):
+                            truncated = True
+                            break
+            except Exception:
+                conn.close()
+                raise
+
+            # Nach frühem Abbruch ist die Antwort nicht fertig gelesen → Verbindung schließen
+            self._release_api_connection(conn, not truncated and not response.will_close)
+
+            return {'success': True, 'events': events, 'horizon': horizon, 'truncated': truncated}
         except Exception as e:
-            print(f"  ❌ Bouquet-Fehler: {e}")
-            return []
-        
-        if not target_bouquet:
-            print(f"  ❌ Bouquet '{bouquet_name}' nicht gefunden")
+            return {'success': False, 'events': 0, 'horizon': None, 'truncated': False, 'error': str(e)}
+
+    def _bulk_epg_counts(self, bouquet_ref, max_events=0):
+        """EPG-Events und Abdeckung aller Services eines Bouquets mit einem Request (None wenn nicht unterstützt)
+
+        Die Antwort wird beim Lesen geparst (XMLPullParser), fertige Events sofort verworfen -
+        auch zig MB epgmulti passen so auf einen Raspberry Pi.
+        """
+        encoded_bouquet = quote(bouquet_ref, safe="")
+        if max_events == 0 and not self.min_horizon_hours:
+            # Für "hat überhaupt EPG" reicht Now/Next
+            endpoint = f'/web/epgnownext?bRef={encoded_bouquet}'
+        else:
+            # Mit Mindest-Abdeckung nur so weit wie nötig (plus Reserve), sonst 14 Tage
+            now = int(time.time())
+            hours = self.min_horizon_hours + self.BULK_MARGIN_HOURS if self.min_horizon_hours else 14 * 24
+            endpoint = f'/web/epgmulti?bRef={encoded_bouquet}&time={now}&endTime={now + int(hours * 3600)}'
+
+        counts = {}
+        root_checked = False
+        try:
+            parser = ET.XMLPullParser(events=('start', 'end'))
+            conn, response = self._api_get(endpoint, timeout=30)
+            try:
+                while True:
+                    chunk = response.read(65536)
+                    if not chunk:
+                        break
+                    parser.feed(chunk)
+
+                    for event, elem in parser.read_events():
+                        if not root_checked:
+                            # Ältere Images kennen den Endpunkt nicht und liefern etwas anderes
+                            if elem.tag != 'e2eventlist':
+                                conn.close()
+                                return None
+                            root_checked = True
+                        if event != 'end' or elem.tag != 'e2event':
+                            continue
+
+                        ref = (elem.findtext('e2eventservicereference') or '').strip()
+                        if ref:
+                            entry = counts.setdefault(_canonical_ref(ref), {'events': 0, 'horizon': None})
+
+                            # Services ohne EPG liefern bei Now/Next einen leeren Platzhalter-Eintrag
+                            start = (elem.findtext('e2eventstart') or '').strip()
+                            if start.isdigit() and int(start) > 0:
+                                entry['events'] += 1
+                                event_duration = (elem.findtext('e2eventduration') or '').strip()
+                                end = int(start) + (int(event_duration) if event_duration.isdigit() else 0)
+                                entry['horizon'] = end if entry['horizon'] is None else max(entry['horizon'], end)
+                        elem.clear()  # Speicher sofort freigeben
+                parser.close()
+            except Exception:
+                conn.close()
+                raise
+            self._release_api_connection(conn, not response.will_close)
+        except Exception:
+            return None
+        if not root_checked:
+            return None
+
+        return counts
+
+    def _incremental_skip_reason(self, service_ref):
+        """Grund, einen Service in diesem Lauf auszulassen (None = prüfen)"""
+        if self.state_db is None:
+            return None
+        state = self.state_db.get(self.host, service_ref)
+        if state is None:
+            return None
+
+        now = time.time()
+        if state['next_attempt'] and state['next_attempt'] > now and state['outcome'] in RefreshStateDB.DEAD_OUTCOMES:
+            return f"Kein Stream ({state['outcome']}) bis {time.strftime('%d.%m. %H:%M', time.localtime(state['next_attempt']))}"
+        if state['next_attempt'] and state['next_attempt'] > now:
+            return f"Backoff nach {state['failures']} Fehlschlägen bis {time.strftime('%d.%m. %H:%M', time.localtime(state['next_attempt']))}"
+        if self.since_hours and state['outcome'] == 'ok' and state['last_refresh'] and now - state['last_refresh'] < self.since_hours * 3600:
+            return f"Refresh vor {(now - state['last_refresh']) / 3600:.1f}h"
+        if self.min_horizon_hours and state['horizon'] and state['horizon'] >= now + self.min_horizon_hours * 3600:
+            return f"EPG bis {time.strftime('%d.%m. %H:%M', time.localtime(state['horizon']))}"
+        return None
+
+    def _observe(self, name, value, service=None):
+        """Messwert an RunMetrics weitergeben (falls aktiv)"""
+        if self.metrics is not None:
+            self.metrics.observe(name, value, service)
+
+    def _sleep(self, seconds):
+        """Pause, die in den Metriken als 'sleep' auftaucht"""
+        time.sleep(seconds)
+        self._observe('sleep', seconds)
+
+    def _record_state(self, service, outcome, bytes_drained=None, time_to_epg=None):
+        """Refresh-Ergebnis in der Status-DB speichern (falls aktiv)"""
+        if self.metrics is not None:
+            self.metrics.service(service, outcome=outcome, bytes_drained=bytes_drained,
+                                 events_before=service.get('events'), horizon=service.get('horizon'))
+        if self.state_db is None:
+            return
+        try:
+            self.state_db.record(self.host, service['ref'], service['name'], outcome,
+                                 bytes_drained=bytes_drained, time_to_epg=time_to_epg, horizon=service.get('horizon'))
+        except Exception as e:
+            print(f"  ⚠️ Status-DB Fehler: {e}")
+
+    @staticmethod
+    def _parse_services(content):
+        """Antwort von /web/getservices → [(ref, name)] in Bouquet-Reihenfolge"""
+        root = ET.fromstring(content)
+        return [((service.findtext('e2servicereference') or '').strip(), (service.findtext('e2servicename') or '').strip())
+                for service in root.findall('.//e2service')]
+
+    def _find_bouquets(self, bouquet_names):
+        """Bouquet-Refs zu den gesuchten Namen (Teilstring, 'all' = alle Bouquets) - [(ref, name)]"""
+        start_time = time.monotonic()
+        bouquets_result = self._make_request('/web/getservices')
+        self._observe('bouquet_lookup', time.monotonic() - start_time)
+        if not bouquets_result['success']:
             return []
-        
-        print(f"  📊 Lade alle Services aus Bouquet...")
-        
-        # Services ohne EPG finden
-        services_result = self._make_request(f'/web/getservices?sRef={quote(target_bouquet, safe="")}')
+
+        # Unveränderte Bouquet-Liste → Cache verwenden statt neu zu parsen
+        available = None
+        if self.topology is not None:
+            digest = self.topology.digest(bouquets_result['content'])
+            available = self.topology.bouquets(self.host, digest)
+            self._topology_changed = available is None
+        if available is None:
+            try:
+                available = [(ref, name) for ref, name in self._parse_services(bouquets_result['content']) if ref.startswith('1:7:')]
+            except Exception as e:
+                print(f"  ❌ Bouquet-Fehler: {e}")
+                return []
+            if self.topology is not None:
+                self.topology.store_bouquets(self.host, digest, available)
+        elif self.debug_mode:
+            print(f"  💾 Bouquet-Liste unverändert (Topologie-Cache)")
+
+        bouquets = []
+        for bouquet_name in bouquet_names:
+            if bouquet_name.lower() == 'all':
+                matches = available
+            else:
+                # Erstes Bouquet, dessen Name den Suchbegriff enthält
+                matches = [next(((ref, name) for ref, name in available if bouquet_name.lower() in name.lower()), None)]
+                if matches[0] is None:
+                    print(f"  ❌ Bouquet '{bouquet_name}' nicht gefunden")
+                    continue
+            for ref, name in matches:
+                if ref not in (known for known, _ in bouquets):
+                    bouquets.append((ref, name))
+                    print(f"  📺 Bouquet gefunden: {name}")
+        return bouquets
+
+    def _bouquet_services(self, bouquet_ref):
+        """Services eines Bouquets [(ref, name)] - aus dem Topologie-Cache oder vom Receiver (None bei Fehler)"""
+        # Frischer Cache und unveränderte Bouquet-Liste → kein Request nötig
+        if self.topology is not None and not self._topology_changed:
+            services = self.topology.services(self.host, bouquet_ref)
+            if services is not None:
+                return services
+
+        start_time = time.monotonic()
+        services_result = self._make_request(f'/web/getservices?sRef={quote(bouquet_ref, safe="")}')
+        self._observe('bouquet_services', time.monotonic() - start_time)
         if not services_result['success']:
-            return []
+            return None
+
+        if self.topology is not None:
+            digest = self.topology.digest(services_result['content'])
+            services = self.topology.services(self.host, bouquet_ref, digest=digest)
+            if services is not None:
+                return services
+        services = self._parse_services(services_result['content'])
+        if self.topology is not None:
+            self.topology.store_services(self.host, bouquet_ref, digest, services)
+        return services
+
+    def iter_services_without_epg(self, bouquet_name, max_events=0):
+        """Liefert Services ohne EPG-Daten einzeln, sobald sie analysiert sind (Generator) - UNLIMITED
+
+        `bouquet_name` darf mehrere Namen kommagetrennt (oder als Liste) enthalten, 'all' steht
+        für alle Bouquets. Services, die in mehreren Bouquets vorkommen, werden nur einmal geprüft.
+        """
+        bouquet_names = _split_bouquet_names(bouquet_name)
+        print(f"🔍 Suche Services ohne EPG in {', '.join(repr(name) for name in bouquet_names)}...")
+        
+        # Bouquets finden
+        bouquets = self._find_bouquets(bouquet_names)
+        if not bouquets:
+            return
         
         services_without_epg = []
         services_with_epg = []
         total_services_in_bouquet = 0
         tv_radio_services = 0
+        incremental_skipped = 0
+        duplicates = 0
+        seen_refs = set()  # Kanonische Refs aus allen Bouquets - jeder Service nur einmal
+
+        # Mindest-Abdeckung: Services deren EPG vorher endet brauchen ebenfalls Refresh
+        min_horizon = time.time() + self.min_horizon_hours * 3600 if self.min_horizon_hours else None
         
-        try:
-            root = ET.fromstring(services_result['content'])
-            all_services = root.findall('.//e2service')
-            total_services_in_bouquet = len(all_services)
-            
-            print(f"  📺 BOUQUET '{bouquet_name}' ENTHÄLT {total_services_in_bouquet} SERVICES TOTAL")
+        for target_bouquet, target_name in bouquets:
+            print(f"  📊 Lade alle Services aus Bouquet '{target_name}'...")
+            horizons = []  # Abdeckung der Services mit EPG, gesammelt gespeichert pro Bouquet
             
-            for service in all_services:
-                service_ref_elem = service.find('e2servicereference')
-                service_name_elem = service.find('e2servicename')
+            # Services ohne EPG finden
+            try:
+                all_services = self._bouquet_services(target_bouquet)
+                if all_services is None:
+                    continue
+                total_services_in_bouquet += len(all_services)
                 
-                if service_ref_elem is not None and service_name_elem is not None:
-                    service_ref = service_ref_elem.text.strip()
-                    service_name = service_name_elem.text.strip()
-                    
+                print(f"  📺 BOUQUET '{target_name}' ENTHÄLT {len(all_services)} SERVICES TOTAL")
+
+                # Alle SIDs pro Transponder merken - der EIT-Sniffer wartet auf den ganzen Mux,
+                # auch wenn in der Pipeline noch nicht alle Services der Gruppe bekannt sind
+                new_services = 0
+                for ref, name in all_services:
+                    key = _transponder_key(ref)
+                    if key is not None and ref.startswith('1:0:'):
+                        self._transponder_sids.setdefault(key, set()).add(_service_id(ref))
+                        if self.harvest is not None:
+                            self.harvest.add_channel(ref, name)
+                    if ref.startswith('1:0:') and _canonical_ref(ref) not in seen_refs:
+                        new_services += 1
+
+                # Bulk-Analyse: ganzes Bouquet in einem Request, sonst Fallback pro Service
+                # (entfällt wenn alle Services schon aus anderen Bouquets bekannt sind)
+                bulk_counts = None
+                if self.bulk_check and new_services:
+                    start_time = time.monotonic()
+                    bulk_counts = self._bulk_epg_counts(target_bouquet, max_events)
+                    self._observe('bulk_epg', time.monotonic() - start_time)
+                    if bulk_counts is not None:
+                        print(f"  ⚡ Bulk-EPG-Analyse: 1 Request für das ganze Bouquet")
+                    else:
+                        print(f"  ⚠️ Bulk-EPG nicht verfügbar - prüfe jeden Service einzeln")
+                
+                for service_ref, service_name in all_services:
                     # Nur echte TV/Radio Services
                     if service_ref.startswith('1:0:') and service_name != "<n/a>":
+                        # Schon aus einem anderen Bouquet bekannt → nicht erneut prüfen/streamen
+                        canonical_ref = _canonical_ref(service_ref)
+                        if canonical_ref in seen_refs:
+                            duplicates += 1
+                            continue
+                        seen_refs.add(canonical_ref)
                         tv_radio_services += 1
 
                         # Skip-Check: Prüfe ob Kanal-Name einen der Skip-Strings enthält
@@ -138,31 +1355,68 @@ class VUStreamEPGRefresher:
                         if should_skip:
                             continue  # Service überspringen        
 
-                        # EPG prüfen
-                        epg_result = self._make_request(f'/web/epgservice?sRef={quote(service_ref, safe="")}')
-                        events = 0
+                        # Inkrementell: kürzlich refreshte Services oder Backoff nicht erneut prüfen
+                        skip_reason = self._incremental_skip_reason(service_ref)
+                        if skip_reason:
+                            incremental_skipped += 1
+                            if self.debug_mode:
+                                print(f"  ⏭️ Übersprungen: {service_name} ({skip_reason})")
+                            continue
 
-                        if epg_result['success']:
-                            events = epg_result['content'].count('<e2event>')
+                        # EPG prüfen
+                        if bulk_counts is not None:
+                            epg = bulk_counts.get(canonical_ref, {'events': 0, 'horizon': None})
+                        else:
+                            # Früher Abbruch sobald klar ist, dass genug EPG vorhanden ist
+                            epg = self._check_epg_events(service_ref, limit=max_events, min_horizon=min_horizon,
+                                                         service={'ref': service_ref, 'name': service_name})
+                        events = epg['events']
+                        service_entry = {'ref': service_ref, 'name': service_name, 'events': events, 'horizon': epg['horizon']}
                         
-                        if events <= max_events:
-                            services_without_epg.append({'ref': service_ref, 'name': service_name, 'events': events})
+                        if events > max_events:
+                            horizons.append((service_ref, service_name, epg['horizon']))
+
+                        if events <= max_events or (min_horizon is not None and (epg['horizon'] or 0) < min_horizon):
+                            services_without_epg.append(service_entry)
                             print(f"  🔄 Braucht Refresh: {service_name} ( {events} Events )")
+                            yield service_entry
                         else:
-                            services_with_epg.append({'ref': service_ref, 'name': service_name, 'events': events})
+                            services_with_epg.append(service_entry)
                             if len(services_with_epg) % 20 == 0:  # Status alle 20 Services
                                 print(f"  ✅ {len(services_with_epg)} Services mit EPG analysiert...")
                             
-        except Exception as e:
-            print(f"  ❌ Service-Analyse Fehler: {e}")
+            except Exception as e:
+                print(f"  ❌ Service-Analyse Fehler: {e}")
+            finally:
+                if horizons and self.state_db is not None:
+                    try:
+                        self.state_db.update_horizons(self.host, horizons)
+                    except Exception as e:
+                        print(f"  ⚠️ Status-DB Fehler: {e}")
         
-        other_services = total_services_in_bouquet - tv_radio_services
+        if self.topology is not None:
+            try:
+                self.topology.save()
+            except Exception as e:
+                print(f"  ⚠️ Topologie-Cache nicht gespeichert: {e}")
+
+        other_services = total_services_in_bouquet - tv_radio_services - duplicates
         print(f"\n📊 BOUQUET-ANALYSE:")
+        if len(bouquets) > 1:
+            print(f"  📚 Bouquets: {len(bouquets)}")
         print(f"  📺 TOTAL Services: {total_services_in_bouquet}")
+        if len(bouquets) > 1:
+            print(f"  🔁 Doppelt (mehrere Bouquets): {duplicates}")
         print(f"  📻 TV/Radio Services: {tv_radio_services}")
         print(f"  📂 Andere (Ordner/etc): {other_services}")
+        if self.state_db is not None:
+            print(f"  ⏭️ Inkrementell übersprungen: {incremental_skipped}")
         print(f"  ✅ Mit EPG: {len(services_with_epg)}")
         print(f"  🔄 Ohne EPG: {len(services_without_epg)} ← Stream-Refresh nötig")
+
+    def find_services_without_epg(self, bouquet_name, max_events=0):
+        """Findet Services ohne EPG-Daten - UNLIMITED"""
+        services_without_epg = list(self.iter_services_without_epg(bouquet_name, max_events=max_events))
         
         # Für Debug: Nur ersten 2 Services für Test
         if self.debug_mode and len(services_without_epg) > 2:
@@ -170,199 +1424,657 @@ class VUStreamEPGRefresher:
             return services_without_epg[:2]
         return services_without_epg  # ALLE ohne Limit!
     
-    def stream_based_epg_refresh(self, services, duration=5.0):
-        """Stream-basiertes EPG-Refresh OHNE Zapping"""
-        if not services:
-            print("✅ Keine Services brauchen EPG-Refresh!")
-            return True, 0
-        
-        print(f"\n🌊 STREAM-BASIERTES EPG-REFRESH")
-        print(f"Services: {len(services)}")
-        print(f"Sweet Spot: {duration}s pro Service")
-        print(f"✅ Live-TV wird NICHT unterbrochen!")
-        print()
+    def _drain_stream(self, response, deadline, max_bytes, sniffer=None, stop_event=None, sock=None, read_timeout=None):
+        """Liest den Stream in einen wiederverwendeten Puffer (readinto) bis ein Abbruchgrund eintritt
+
+        Abbruch bei Deadline (time.monotonic), `max_bytes`, EOF, gesetztem `stop_event` oder
+        kompletter EIT im Sniffer. Mit --rate-limit wird die Empfangsrate pro Stream begrenzt.
+        Kommt bis zum Socket-Timeout kein erstes Byte ('no_data') oder ist der Stream verschlüsselt
+        ohne EIT ('scrambled'), wird sofort abgebrochen. Nach dem ersten Chunk gilt `read_timeout`.
+        Gibt (bytes_received, chunks_count, stop_reason, first_byte_at) zurück (time.monotonic() des ersten Chunks).
+        """
+        buffer = getattr(self._drain_local, 'buffer', None)
+        if buffer is None:
+            # Ein Puffer pro Worker-Thread, wird für alle Streams wiederverwendet
+            buffer = self._drain_local.buffer = memoryview(bytearray(self.DRAIN_CHUNK_SIZE))
+
+        rate = self.rate_limit * 1024 if self.rate_limit else None
+        start_time = time.monotonic()
+        bytes_received = 0
+        chunks_count = 0
+        first_byte_at = None
+
+        while True:
+            if time.monotonic() >= deadline:
+                return bytes_received, chunks_count, 'duration', first_byte_at
+
+            try:
+                received = response.readinto(buffer)
+            except Exception as read_e:
+                if self.debug_mode:
+                    print(f"    ❌ Read error: {read_e}")
+                return bytes_received, chunks_count, 'read_error' if chunks_count else 'no_data', first_byte_at
+
+            if not received:
+                return bytes_received, chunks_count, 'eof' if chunks_count else 'no_data', first_byte_at
+
+            if not chunks_count:
+                first_byte_at = time.monotonic()
+                if sock is not None and read_timeout is not None:
+                    sock.settimeout(read_timeout)  # Daten fließen → normales Lese-Timeout
+
+            bytes_received += received
+            chunks_count += 1
+
+            if self.debug_mode and chunks_count <= 3:
+                print(f"    📦 Chunk {chunks_count}: {received} bytes ({bytes_received//1024}KB total)")
+
+            if bytes_received > max_bytes:
+                return bytes_received, chunks_count, 'max_bytes', first_byte_at
+
+            # EPG-Poller hat neue Events gefunden → Ziel erreicht
+            if stop_event is not None and stop_event.is_set():
+                return bytes_received, chunks_count, 'epg_poll', first_byte_at
+
+            # EPG komplett im Stream gesehen → --duration ist nur Obergrenze
+            if sniffer is not None:
+                if sniffer.feed(buffer[:received]) and self.eit_sniff:
+                    return bytes_received, chunks_count, 'eit_complete', first_byte_at
+                if sniffer.is_scrambled(self.SCRAMBLED_PROBE_PACKETS):
+                    return bytes_received, chunks_count, 'scrambled', first_byte_at
+
+            # Rate-Limit: vorauslaufende Bytes durch kurzes Warten ausgleichen
+            if rate:
+                ahead = bytes_received / rate - (time.monotonic() - start_time)
+                if ahead > 0:
+                    time.sleep(min(ahead, max(0.0, deadline - time.monotonic())))
+
+    def _stream_service(self, service, duration, service_ids=None, stop_event=None):
+        """Holt den Stream eines Services für max. `duration` Sekunden (Port 8001)
+
+        Mit EIT-Sniffer endet der Stream früher, sobald das EPG der `service_ids` durch ist,
+        ebenso sobald `stop_event` gesetzt wird (EPG-Poller hat neue Events gefunden).
+        Tote Services scheitern schnell (Connect-/First-Byte-Timeout), der Grund steht in 'reason'.
+        """
+        encoded_ref = quote(service['ref'], safe='')
         
-        successful = 0
-        total_new_events = 0
+        # BUGFIX: Korrekte Stream URLs für Port 8001 basierend auf VU+ M3U8 Format
+        #stream_urls = [
+        #    f'/{service["ref"]}',                       # Direkt Service-Ref (wie in M3U8)
+        #    f'/web/ts?sRef={encoded_ref}',              # Web-Interface TS (Port 80)
+        #    f'/web/stream.m3u8?ref={encoded_ref}',      # Web-Interface M3U8 (Port 80)
+        #    f'/web/stream?ref={encoded_ref}',           # Web-Interface Generic (Port 80)
+        #]
+        stream_urls = [
+            f'/{service["ref"]}',                       # Direkt Service-Ref (wie in M3U8)
+        ]
+
+        stream_success = False
+        bytes_received = 0
+        eit_complete = False
+        elapsed = 0.0
+        failure_reason = None  # scrambled, no_data, http_error, busy oder connect_failed
         
-        for i, service in enumerate(services):
-            print(f"[{i+1:2d}/{len(services)}] {service['name'][:20]:<20}", end=" ")
-            
+        for j, stream_url in enumerate(stream_urls):
             try:
-                encoded_ref = quote(service['ref'], safe='')
+                """
+                if self.debug_mode:
+                    print(f"\n    🔗 URL {j+1}: {stream_url}")
+                else:
+                    print(f"📡{j+1}", end=" ")
+                """
+                
+                # BUGFIX: Erste URL über Port 8001 (Stream-Server), andere über Port 80 (Web-Interface)
+                if j == 0:  # Erste URL ist direkter Stream auf Port 8001
+                    full_url = self.stream_base_url + stream_url
+                else:  # Andere URLs über Web-Interface auf Port 80
+                    full_url = self.base_url + stream_url
+                
+                port = self.stream_port if j == 0 else self.port
+                
+                # BUGFIX: Verbesserte HTTP-Header für VU+ Kompatibilität
+                headers = {
+                    'User-Agent': 'VLC/3.0.16 LibVLC/3.0.16',  # VLC für beste Kompatibilität
+                    'Accept': '*/*',
+                    'Accept-Encoding': 'identity',  # Verhindert Kompression-Probleme
+                    'Connection': 'close',          # Verhindert Keep-Alive Issues
+                    'Cache-Control': 'no-cache',    # Verhindert Caching-Probleme
+                }
+                
+                # HTTP Basic Authentication hinzufügen falls vorhanden
+                if self._auth_header:
+                    headers['Authorization'] = self._auth_header
                 
-                # BUGFIX: Korrekte Stream URLs für Port 8001 basierend auf VU+ M3U8 Format
-                #stream_urls = [
-                #    f'/{service["ref"]}',                       # Direkt Service-Ref (wie in M3U8)
-                #    f'/web/ts?sRef={encoded_ref}',              # Web-Interface TS (Port 80)
-                #    f'/web/stream.m3u8?ref={encoded_ref}',      # Web-Interface M3U8 (Port 80)
-                #    f'/web/stream?ref={encoded_ref}',           # Web-Interface Generic (Port 80)
-                #]
-                stream_urls = [
-                    f'/{service["ref"]}',                       # Direkt Service-Ref (wie in M3U8)
-                ]
-
-                stream_success = False
                 bytes_received = 0
+                chunks_count = 0
+                sniffer = None
+                if self.eit_sniff or self.harvest is not None:
+                    sniffer = EITSniffer(service_ids or [_service_id(service['ref'])], harvest=self.harvest)
+                
+                # BUGFIX: Dynamisches Timeout (6-20s Range) - erst wenn Daten fließen
+                timeout = min(max(duration + 3, 6), 20)
+                
+                if self.debug_mode:
+                    print(f"    ⏱️ Timeout: connect {self.connect_timeout}s, first byte {self.first_byte_timeout}s, read {timeout}s, Duration: {duration}s")
                 
-                for j, stream_url in enumerate(stream_urls):
+                start_time = time.monotonic()
+                conn = http.client.HTTPConnection(self.host, port, timeout=self.connect_timeout)
+                try:
                     try:
-                        """
-                        if self.debug_mode:
-                            print(f"\n    🔗 URL {j+1}: {stream_url}")
-                        else:
-                            print(f"📡{j+1}", end=" ")
-                        """
-                        
-                        # BUGFIX: Erste URL über Port 8001 (Stream-Server), andere über Port 80 (Web-Interface)
-                        if j == 0:  # Erste URL ist direkter Stream auf Port 8001
-                            full_url = self.stream_base_url + stream_url
-                            print(f" {full_url} ", end=" ")
-                        else:  # Andere URLs über Web-Interface auf Port 80
-                            full_url = self.base_url + stream_url
-                        
-                        req = urllib.request.Request(full_url)
-                        
-                        # HTTP Basic Authentication hinzufügen falls vorhanden
-                        if self.username and self.password:
-                            credentials = f"{self.username}:{self.password}"
-                            encoded = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
-                            req.add_header('Authorization', f'Basic {encoded}')
-                        
-                        # BUGFIX: Verbesserte HTTP-Header für VU+ Kompatibilität
-                        req.add_header('User-Agent', 'VLC/3.0.16 LibVLC/3.0.16')  # VLC für beste Kompatibilität
-                        req.add_header('Accept', '*/*')
-                        req.add_header('Accept-Encoding', 'identity')  # Verhindert Kompression-Probleme
-                        req.add_header('Connection', 'close')          # Verhindert Keep-Alive Issues
-                        req.add_header('Cache-Control', 'no-cache')   # Verhindert Caching-Probleme
-                        
-                        start_time = time.time()
-                        bytes_received = 0
-                        chunks_count = 0
-                        
-                        # BUGFIX: Dynamisches Timeout (6-20s Range)
-                        timeout = min(max(duration + 3, 6), 20)
-                        
-                        if self.debug_mode:
-                            print(f"    ⏱️ Timeout: {timeout}s, Duration: {duration}s")
-                        
-                        with urllib.request.urlopen(req, timeout=timeout) as response:
-                            content_type = response.headers.get('Content-Type', '').lower()
-                            content_length = response.headers.get('Content-Length', 'unknown')
-                            
-                            if self.debug_mode:
-                                print(f"    ✅ Connected! Status: {response.status}")
-                                print(f"    📋 Content-Type: {content_type}")
-                                print(f"    📏 Content-Length: {content_length}")
-                                print(f"    🔄 Reading chunks...")
-                            
-                            while (time.time() - start_time) < duration:
-                                try:
-                                    # BUGFIX: 16KB Chunks für bessere Performance
-                                    chunk = response.read(16384)
-                                    if not chunk:
-                                        if self.debug_mode:
-                                            print(f"    📭 No more data (EOF)")
-                                        break
-                                    
-                                    bytes_received += len(chunk)
-                                    chunks_count += 1
-                                    
-                                    if self.debug_mode and chunks_count <= 3:
-                                        print(f"    📦 Chunk {chunks_count}: {len(chunk)} bytes ({bytes_received//1024}KB total)")
-                                    
-                                    # BUGFIX: Adaptive Limits basierend auf Content-Type
-                                    if 'video' in content_type or 'octet-stream' in content_type:
-                                        max_bytes = 5*1024*1024  # 5MB für Video-Streams
-                                        min_bytes = 16*1024     # 16KB Minimum für Video
-                                    else:
-                                        max_bytes = 3*1024*1024  # 3MB für andere
-                                        min_bytes = 4*1024      # 4KB Minimum für andere
-                                    
-                                    if bytes_received > max_bytes:
-                                        if self.debug_mode:
-                                            print(f"    🛑 Max limit reached: {bytes_received//1024}KB")
-                                        break
-                                    
-                                    # BUGFIX: Weniger strenge Erfolgs-Erkennung
-                                    #if chunks_count >= 3 and bytes_received >= min_bytes:
-                                    #    if self.debug_mode:
-                                    #        print(f"    🚀 Early success: {chunks_count} chunks, {bytes_received//1024}KB")
-                                    #    #break
-                                        
-                                except Exception as read_e:
-                                    if self.debug_mode:
-                                        print(f"    ❌ Read error: {read_e}")
-                                    break
-                        
-                        # BUGFIX: Weniger strenge Stream-Validierung
-                        min_threshold = 8*1024 if 'video' in content_type or 'octet-stream' in content_type else 2*1024
-                        
-                        if self.debug_mode:
-                            print(f"    📊 Final: {bytes_received} bytes, {chunks_count} chunks, threshold: {min_threshold}")
-                        
-                        # Erfolg wenn wir mindestens etwas bekommen haben
-                        if bytes_received >= min_threshold and chunks_count >= 1:
-                            stream_success = True
-                            if self.debug_mode:
-                                print(f"    ✅ SUCCESS: {bytes_received//1024}KB received")
-                            else:
-                                print(f"📊{bytes_received//1024}KB", end=" ")
-                            break
-                        else:
-                            if self.debug_mode:
-                                print(f"    ⚠️ Not enough data: {bytes_received} bytes < {min_threshold} or {chunks_count} chunks < 1")
-                            
-                    # BUGFIX: Spezifisches Exception-Handling mit Debug-Output
-                    except urllib.error.HTTPError as e:
+                        conn.connect()
+                        self._observe('stream_connect', time.monotonic() - start_time, service)
+                    except OSError as e:
+                        # Stream-Server nicht erreichbar - betrifft die Box, nicht den Service
+                        failure_reason = 'connect_failed'
                         if self.debug_mode:
-                            print(f"    ❌ HTTP Error {e.code}: {e.reason}")
-                        if e.code == 404:  # Service nicht verfügbar
-                            continue
-                        elif e.code == 403:  # Zugriff verweigert
-                            continue  
-                        elif e.code >= 500:  # Server-Fehler
-                            time.sleep(0.1)
-                            continue
+                            print(f"    ❌ Connect Error: {e}")
+                        continue
+
+                    conn.sock.settimeout(self.first_byte_timeout)
+                    request_start = time.monotonic()
+                    conn.request('GET', stream_url, headers=headers)
+                    response = conn.getresponse()
+
+                    if response.status >= 400:
+                        # Nur 404/403 sind endgültig - 5xx (z.B. 503 wenn alle Tuner belegt sind) ist vorübergehend
+                        if response.status >= 500:
+                            failure_reason = 'busy'
                         else:
-                            continue
-                    except urllib.error.URLError as e:
-                        if self.debug_mode:
-                            print(f"    ❌ URL Error: {e.reason}")
-                        continue  # Netzwerk-Probleme
-                    except Exception as e:
+                            failure_reason = 'http_error' if response.status in (403, 404) else None
                         if self.debug_mode:
-                            print(f"    ❌ Other Exception: {type(e).__name__}: {e}")
-                        continue  # Andere Fehler
+                            print(f"    ❌ HTTP Error {response.status}: {response.reason}")
+                        continue
+
+                    content_type = response.headers.get('Content-Type', '').lower()
+                    content_length = response.headers.get('Content-Length', 'unknown')
+                    
+                    if self.debug_mode:
+                        print(f"    ✅ Connected! Status: {response.status}")
+                        print(f"    📋 Content-Type: {content_type}")
+                        print(f"    📏 Content-Length: {content_length}")
+                        print(f"    🔄 Reading chunks...")
+                    
+                    # BUGFIX: Adaptive Limits basierend auf Content-Type (einmal pro Stream)
+                    is_video = 'video' in content_type or 'octet-stream' in content_type
+                    max_bytes = 5*1024*1024 if is_video else 3*1024*1024  # 5MB Video, 3MB andere
+
+                    bytes_received, chunks_count, stop_reason, first_byte_at = self._drain_stream(
+                        response, start_time + duration, max_bytes, sniffer=sniffer, stop_event=stop_event,
+                        sock=conn.sock, read_timeout=timeout)
+
+                    # Metriken: Zeit bis zum ersten Byte, Drain-Dauer und Durchsatz
+                    if first_byte_at is not None:
+                        drain_time = time.monotonic() - first_byte_at
+                        self._observe('first_byte', first_byte_at - request_start, service)
+                        self._observe('drain', drain_time, service)
+                        if drain_time > 0:
+                            self._observe('drain_throughput', bytes_received / 1024 / drain_time, service)
+
+                    if self.debug_mode:
+                        print(f"    🛑 Stop: {stop_reason} after {time.monotonic() - start_time:.1f}s, {bytes_received//1024}KB")
+                finally:
+                    conn.close()
                 
-                if not stream_success:
-                    print("❌")
+                elapsed = time.monotonic() - start_time
+                eit_complete = sniffer is not None and sniffer.done
+
+                # Kein nutzbarer Stream: keine Daten bis zum First-Byte-Timeout oder verschlüsselt ohne EIT
+                if stop_reason in ('no_data', 'scrambled'):
+                    failure_reason = stop_reason
                     continue
+
+                # BUGFIX: Weniger strenge Stream-Validierung
+                min_threshold = 8*1024 if is_video else 2*1024
                 
-                # EPG prüfen
-                time.sleep(0.5)
-                epg_result = self._make_request(f'/web/epgservice?sRef={encoded_ref}', timeout=10)
+                if self.debug_mode:
+                    print(f"    📊 Final: {bytes_received} bytes, {chunks_count} chunks, threshold: {min_threshold}")
                 
-                if epg_result['success']:
-                    events = epg_result['content'].count('<e2event>')
-                    new_events = events - service['events']
-                    total_new_events += max(0, new_events)
-                    successful += 1
+                # Erfolg wenn wir mindestens etwas bekommen haben (oder die EIT komplett war)
+                if (bytes_received >= min_threshold or eit_complete) and chunks_count >= 1:
+                    stream_success = True
+                    failure_reason = None
+                    if self.debug_mode:
+                        print(f"    ✅ SUCCESS: {bytes_received//1024}KB received")
+                    break
+                else:
+                    failure_reason = None
+                    if self.debug_mode:
+                        print(f"    ⚠️ Not enough data: {bytes_received} bytes < {min_threshold} or {chunks_count} chunks < 1")
                     
-                    if events > 0:
-                        print(f"✅ {events} events")
-                    else:
-                        print(f"⚠️ 0 events")
+            # BUGFIX: Spezifisches Exception-Handling mit Debug-Output
+            except (http.client.HTTPException, OSError) as e:
+                # Header kamen nicht innerhalb des First-Byte-Timeouts oder Verbindung brach ab
+                failure_reason = 'no_data' if isinstance(e, socket.timeout) else None
+                if self.debug_mode:
+                    print(f"    ❌ Stream Error: {type(e).__name__}: {e}")
+                continue
+            except Exception as e:
+                failure_reason = None
+                if self.debug_mode:
+                    print(f"    ❌ Other Exception: {type(e).__name__}: {e}")
+                continue  # Andere Fehler
+
+        return {'success': stream_success, 'bytes': bytes_received, 'elapsed': elapsed, 'eit_complete': eit_complete,
+                'reason': failure_reason}
+
+    def _check_epg_events(self, service_ref, limit=None, min_horizon=None, service=None):
+        """EPG eines Services prüfen - Ergebnis mit events, horizon und truncated"""
+        start_time = time.monotonic()
+        result = self._count_epg_events(f'/web/epgservice?sRef={quote(service_ref, safe="")}', limit=limit, min_horizon=min_horizon)
+        self._observe('epg_check', time.monotonic() - start_time, service)
+        return result
+
+    def _service_value(self, service, now):
+        """Nutzen eines Refresh: 1.0 ohne EPG, sonst je kürzer die Abdeckung desto mehr"""
+        if service['events'] == 0:
+            return 1.0
+        if not service.get('horizon'):
+            return 0.5
+        target = (self.min_horizon_hours or self.PLAN_HORIZON_HOURS) * 3600
+        return max(0.1, 1.0 - (service['horizon'] - now) / target)
+
+    def _expected_group_cost(self, services, duration):
+        """Erwartete Sekunden für einen Transponder: Stream + Wartezeit + EPG-Checks, geteilt durch Erfolgschance"""
+        transponder = _transponder_key(services[0]['ref'])
+        learned_duration = self.stats.duration_for(transponder, duration) if self.stats else None
+        wait = max(1.0, 2 * self.poll_interval) if self.poll_interval else 0.7
+        cost = (learned_duration or duration) + wait + self.EPG_CHECK_COST * len(services)
+
+        # Wiederholte Fehlschläge machen einen Transponder teurer
+        state = self.state_db.get(self.host, services[0]['ref']) if self.state_db is not None else None
+        failures = (state['failures'] or 0) if state else 0
+        return cost * (1 + failures)
+
+    def plan_by_value(self, services, duration):
+        """Services nach Nutzen pro erwarteter Sekunde sortieren (ganze Transponder-Gruppen)
+
+        Nutzen = Summe der EPG-Lücken aller Services eines Transponders (ein Stream deckt alle ab),
+        Kosten = gelernte bzw. maximale Duration plus Wartezeit und EPG-Checks, mit Fehlschlägen teurer.
+        """
+        now = time.time()
+        planned = []
+        for group in self.plan_transponder_groups(services):
+            value = sum(self._service_value(service, now) for service in group['services'])
+            cost = self._expected_group_cost(group['services'], duration)
+            planned.append((value / cost, cost, group))
+        planned.sort(key=lambda entry: -entry[0])
+
+        if self.budget:
+            workers = min(self.resolve_workers(), len(planned)) or 1
+            capacity = self.budget * workers
+            fitting = len(list(itertools.takewhile(lambda cost: cost <= capacity,
+                                                   itertools.accumulate(cost for _, cost, _ in planned))))
+            print(f"🧮 Budget-Plan: {len(planned)} Transponder, ~{fitting} passen in {self.budget:.0f}s ({workers} Worker)")
+        return [service for _, _, group in planned for service in group['services']]
+
+    def plan_transponder_groups(self, services):
+        """Gruppiert Services nach Transponder - ein Stream pro Mux reicht für EIT aller Services"""
+        groups = []
+        groups_by_key = {}
+
+        for service in services:
+            key = _transponder_key(service['ref']) if self.transponder_dedup else None
+
+            # Ohne gültigen Transponder-Schlüssel bekommt jeder Service eine eigene Gruppe
+            if key is None or key not in groups_by_key:
+                group = {'key': key, 'services': []}
+                groups.append(group)
+                if key is not None:
+                    groups_by_key[key] = group
+            else:
+                group = groups_by_key[key]
+
+            group['services'].append(service)
+
+        return groups
+
+    def detect_tuner_count(self):
+        """Ermittelt die Anzahl der Tuner über /web/deviceinfo bzw. /web/about (None wenn unbekannt)"""
+        for endpoint, path in (('/web/deviceinfo', './/e2frontend'), ('/web/about', './/e2nim')):
+            result = self._make_request(endpoint)
+            if not result['success']:
+                continue
+            try:
+                tuners = ET.fromstring(result['content']).findall(path)
+            except Exception:
+                continue
+            if tuners:
+                return len(tuners)
+        return None
+
+    def box_busy(self):
+        """Grund, gerade nicht zu streamen (Standby, laufende Aufnahme) - None = Box ist frei"""
+        result = self._make_request('/web/powerstate')
+        if result['success']:
+            try:
+                if (ET.fromstring(result['content']).findtext('e2instandby') or '').strip().lower() == 'true':
+                    return "Standby"
+            except ET.ParseError:
+                pass
+
+        result = self._make_request('/web/timerlist')
+        if result['success']:
+            try:
+                for timer in ET.fromstring(result['content']).findall('e2timer'):
+                    # e2state 2 = läuft, Zap-Timer (justplay) belegen keinen Tuner für eine Aufnahme
+                    if (timer.findtext('e2state') or '').strip() == '2' and (timer.findtext('e2justplay') or '0').strip() != '1':
+                        return f"Aufnahme läuft: {(timer.findtext('e2name') or '').strip()}"
+            except ET.ParseError:
+                pass
+        return None
+
+    def resolve_workers(self):
+        """Anzahl paralleler Stream-Worker - bei 'auto' alle Tuner bis auf einen für Live-TV"""
+        if self.workers != 'auto':
+            return max(1, int(self.workers))
+
+        if self._resolved_workers is None:
+            tuners = self.detect_tuner_count()
+            if not tuners:
+                print("  ⚠️ Tuner-Anzahl unbekannt - verwende 1 Worker")
+                self._resolved_workers = 1
+            elif tuners == 1:
+                # Kein Tuner frei zu halten - der Refresh belegt den einzigen Tuner
+                self._resolved_workers = 1
+                print("  ⚠️ Nur 1 Tuner erkannt → 1 Worker, Live-TV auf einem anderen Transponder wird während der Streams gestört")
+            else:
+                self._resolved_workers = tuners - 1
+                print(f"  📡 {tuners} Tuner erkannt → {self._resolved_workers} Worker (1 Tuner bleibt für Live-TV frei)")
+        return self._resolved_workers
+
+    def _report(self, progress, service, text):
+        """Gibt eine komplette Service-Zeile aus (thread-sicher für parallele Worker)"""
+        with self._print_lock:
+            progress['position'] += 1
+            print(f"[{progress['position']:2d}/{progress['total']}] {service['name'][:20]:<20} {text}")
+
+    def _start_epg_poller(self, service, interval=None, start_time=None):
+        """Pollt das EPG eines Services im Hintergrund, `found` wird gesetzt sobald neue Events da sind
+
+        `elapsed` zählt ab `start_time` (Standard: jetzt), z.B. ab Stream-Start bei Poller nach dem Stream.
+        """
+        poller = {'found': threading.Event(), 'stop': threading.Event(), 'elapsed': None}
+        start_time = start_time or time.time()
+        interval = interval or self.poll_interval
+
+        def poll():
+            while not poller['stop'].wait(interval):
+                # Früher Abbruch: ein Event mehr als vorher reicht als Nachweis
+                epg = self._check_epg_events(service['ref'], limit=service['events'], service=service)
+                if epg['success'] and epg['events'] > service['events']:
+                    poller['elapsed'] = time.time() - start_time
+                    poller['found'].set()
+                    return
+
+        threading.Thread(target=poll, daemon=True).start()
+        return poller
+
+    def _check_refreshed_service(self, service, prefix, progress, result, **record_kwargs):
+        """EPG eines Services nach dem Refresh prüfen, speichern und ausgeben - gibt events zurück (None bei Fehler)"""
+        try:
+            epg = self._check_epg_events(service['ref'], service=service)
+        except Exception as e:
+            self._report(progress, service, f"{prefix} ❌ {str(e)[:15]}")
+            return None
+
+        if not epg['success']:
+            self._record_state(service, 'epg_failed')
+            self._report(progress, service, f"{prefix} ❌ EPG failed")
+            return None
+
+        events = epg['events']
+        service['horizon'] = epg['horizon']
+        if self.metrics is not None:
+            self.metrics.service(service, events_after=events)
+        self._record_state(service, 'ok' if events > 0 else 'no_epg', **record_kwargs)
+
+        new_events = events - service['events']
+        result['new_events'] += max(0, new_events)
+        result['successful'] += 1
+
+        if events > 0:
+            self._report(progress, service, f"{prefix} ✅ {events} events")
+        else:
+            self._report(progress, service, f"{prefix} ⚠️ 0 events")
+        return events
+
+    def _take_queue(self, group, finish=False, streamed=False):
+        """Wartende Services einer Gruppe übernehmen - mit `finish` wird eine leere Gruppe abgeschlossen"""
+        with self._group_lock:
+            pending = group['queue']
+            group['queue'] = []
+            if finish and not pending:
+                group['streamed'] = streamed
+                group['done'] = True
+            return pending
+
+    def _refresh_group(self, group, duration, progress):
+        """Streamt einen Repräsentanten des Transponders und prüft danach das EPG der ganzen Gruppe
+
+        Services, die während des Streams noch dazukommen (Pipeline), werden anschließend mitgeprüft.
+        """
+        result = {'successful': 0, 'new_events': 0, 'stream_sessions': 0, 'deferred': 0}
+        pending = self._take_queue(group)
+
+        # Gelernte Duration für diesen Transponder, --duration bleibt Obergrenze
+        transponder = _transponder_key(group['services'][0]['ref'])
+        max_duration = duration
+        learned_duration = self.stats.duration_for(transponder, max_duration) if self.stats else None
+        if learned_duration is not None:
+            duration = learned_duration
+
+        # Zeitbudget: Transponder nur starten, wenn er voraussichtlich noch hineinpasst
+        if self._deadline is not None and time.monotonic() + self._expected_group_cost(pending, max_duration) > self._deadline:
+            while pending:
+                for service in pending:
+                    self._record_state(service, 'deferred')
+                    self._report(progress, service, "⏳ Budget erschöpft → nächster Lauf")
+                result['deferred'] += len(pending)
+                pending = self._take_queue(group, finish=True)
+            return result
+
+        streamed = None
+        aborted = False
+        busy_retries = 0
+        while True:
+            # Stream-Phase: Erster Service der Gruppe, bei Fehler der nächste als Ersatz
+            while pending and streamed is None and not aborted:
+                service = pending.pop(0)
+
+                # EIT-Sniffer wartet auf das EPG der Gruppe und aller Bouquet-Services auf dem Transponder
+                with self._group_lock:
+                    service_ids = set(_service_id(member['ref']) for member in group['services'])
+                service_ids |= self._transponder_sids.get(transponder, set())
+
+                # Poll-Modus: EPG schon während des Streams prüfen, Stream endet beim ersten Treffer
+                poller = self._start_epg_poller(service) if self.poll_interval else None
+                stop_event = poller['found'] if poller else None
+
+                try:
+                    result['stream_sessions'] += 1
+                    stream = self._stream_service(service, duration, service_ids=service_ids, stop_event=stop_event)
+                except Exception as e:
+                    if poller:
+                        poller['stop'].set()
+                    self._record_state(service, 'stream_failed', bytes_drained=0)
+                    self._report(progress, service, f"❌ {str(e)[:15]}")
+                    continue
+
+                if not stream['success']:
+                    if poller:
+                        poller['stop'].set()
+                    reason = stream['reason']
+                    if reason == 'busy' and busy_retries < self.BUSY_RETRIES:
+                        busy_retries += 1
+                        pending.insert(0, service)
+                        self._sleep(self.BUSY_RETRY_DELAY)
+                        continue
+                    if reason in ('busy', 'connect_failed'):
+                        # Betrifft die Box, nicht den Service → nichts speichern, Rest der Gruppe im nächsten Lauf
+                        self._report(progress, service, f"❌ {self.FAILURE_LABELS[reason]}")
+                        aborted = True
+                        break
+                    # Tote Services (verschlüsselt, keine Daten, 404/403) landen im Negativ-Cache
+                    outcome = reason if reason in RefreshStateDB.DEAD_OUTCOMES else 'stream_failed'
+                    self._record_state(service, outcome, bytes_drained=stream['bytes'])
+                    self._report(progress, service, f"❌ {self.FAILURE_LABELS.get(reason, '')}".rstrip())
+                    continue
+
+                streamed = service
+                stream_info = f"📡 📊{stream['bytes']//1024}KB"
+                if learned_duration is not None:
+                    stream_info += f" 🎓{learned_duration:.1f}s"
+                if stream['eit_complete']:
+                    stream_info += f" ⚡EIT {stream['elapsed']:.1f}s"
+
+                time_to_epg = None
+                if poller is None and stream['eit_complete']:
+                    # EIT im Stream heißt noch nicht, dass der EPG-Cache der Box sie übernommen hat → nachpollen
+                    poller = self._start_epg_poller(service, interval=self.EIT_GRACE_POLL,
+                                                    start_time=time.time() - stream['elapsed'])
+                if poller:
+                    # Nachlaufzeit falls das EPG erst kurz nach Stream-Ende verarbeitet wird
+                    grace = max(1.0, 2 * (self.poll_interval or 0))
+                    if stream['eit_complete']:
+                        grace = max(grace, self.EIT_GRACE)
+                    wait_start = time.monotonic()
+                    poller['found'].wait(grace)
+                    self._observe('sleep', time.monotonic() - wait_start)
+                    poller['stop'].set()
+                    time_to_epg = poller['elapsed']
+                    self._observe('time_to_epg', time_to_epg, service)
+                    if poller['elapsed'] is not None:
+                        stream_info += f" ⏱️EPG {poller['elapsed']:.1f}s"
                 else:
-                    print("❌ EPG failed")
-                
+                    self._sleep(0.5)
+
+                # EPG prüfen - Stream-Service zuerst, danach alle Services auf demselben Transponder
+                events = self._check_refreshed_service(service, stream_info, progress, result,
+                                                       bytes_drained=stream['bytes'], time_to_epg=time_to_epg)
+
+                # Lernen: Zeit bis zum neuen EPG (Poller) bzw. bis die EIT komplett war.
+                # Ohne neues EPG trotz gelernter Duration zählt die Obergrenze → Duration steigt wieder
+                if self.stats is not None and events is not None:
+                    if events > service['events']:
+                        if time_to_epg is not None:
+                            self.stats.record(transponder, time_to_epg)
+                        elif stream['eit_complete']:
+                            self.stats.record(transponder, stream['elapsed'])
+                    elif learned_duration is not None:
+                        self.stats.record(transponder, max_duration)
+
+            if aborted:
+                for service in pending:
+                    self._report(progress, service, "⏭️ Box nicht bereit → nächster Lauf")
+            elif streamed is not None:
+                for service in pending:
+                    self._check_refreshed_service(service, "↪ Transponder", progress, result)
+
+            # Nachzügler aus der Pipeline übernehmen, sonst ist die Gruppe fertig
+            pending = self._take_queue(group, finish=True, streamed=streamed is not None)
+            if not pending:
+                break
+
+        if not self.poll_interval:
+            self._sleep(0.2)  # Kurze Pause
+        return result
+
+    def _recheck_services(self, services, progress):
+        """Services eines bereits gestreamten Transponders nur auf neues EPG prüfen"""
+        result = {'successful': 0, 'new_events': 0, 'stream_sessions': 0, 'deferred': 0}
+        for service in services:
+            self._check_refreshed_service(service, "↪ Transponder", progress, result)
+        return result
+
+    def _dispatch_service(self, service, groups, executor, futures, duration, progress):
+        """Service dem Stream-Worker seines Transponders zuordnen (neue Gruppe, Nachzügler oder Recheck)"""
+        key = _transponder_key(service['ref']) if self.transponder_dedup else None
+
+        with self._group_lock:
+            group = groups.get(key) if key is not None else None
+
+            if group is not None and not group['done']:
+                # Transponder ist noch in Arbeit → wird vom selben Worker mitgeprüft
+                group['services'].append(service)
+                group['queue'].append(service)
+                return
+
+            if group is not None and group['streamed']:
+                # Transponder wurde schon gestreamt → nur noch EPG prüfen, kein neuer Stream
+                futures.append(executor.submit(_with_output_label(self._recheck_services), [service], progress))
+                return
+
+            group = {'key': key, 'services': [service], 'queue': [service], 'done': False, 'streamed': False}
+            if key is not None:
+                groups[key] = group
+            progress['groups'] += 1
+
+        futures.append(executor.submit(_with_output_label(self._refresh_group), group, duration, progress))
+
+    def stream_based_epg_refresh(self, services, duration=5.0):
+        """Stream-basiertes EPG-Refresh OHNE Zapping
+
+        `services` kann eine Liste oder ein Iterator sein (Pipeline: Streams starten,
+        während die Bouquet-Analyse noch läuft).
+        """
+        if isinstance(services, list):
+            if not services:
+                print("✅ Keine Services brauchen EPG-Refresh!")
+                return True, 0
+            total = len(services)
+            planned_groups = len(self.plan_transponder_groups(services))
+            workers = min(self.resolve_workers(), planned_groups)
+        else:
+            total = '?'
+            planned_groups = None
+            workers = self.resolve_workers()
+
+        print(f"\n🌊 STREAM-BASIERTES EPG-REFRESH")
+        if planned_groups is not None:
+            print(f"Services: {total}")
+            print(f"Transponder: {planned_groups} (1 Stream pro Transponder)")
+        else:
+            print(f"Services: laufend aus der Analyse (Pipeline)")
+        print(f"Worker: {workers} parallel")
+        print(f"Sweet Spot: {duration}s pro Stream")
+        print(f"✅ Live-TV wird NICHT unterbrochen!")
+        print()
+        
+        progress = {'position': 0, 'total': total, 'groups': 0}
+        groups = {}
+        futures = []
+        processed = 0
+
+        # Jeder Worker arbeitet einen eigenen Transponder ab
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for service in services:
+                processed += 1
+                self._dispatch_service(service, groups, executor, futures, duration, progress)
+            results = [future.result() for future in futures]
+
+        if processed == 0:
+            print("✅ Keine Services brauchen EPG-Refresh!")
+            return True, 0
+
+        if self.stats is not None:
+            try:
+                self.stats.save()
             except Exception as e:
-                print(f"❌ {str(e)[:15]}")
-            
-            time.sleep(0.2)  # Kurze Pause
+                print(f"⚠️ Statistik konnte nicht gespeichert werden: {e}")
+
+        successful = sum(r['successful'] for r in results)
+        total_new_events = sum(r['new_events'] for r in results)
+        stream_sessions = sum(r['stream_sessions'] for r in results)
+        deferred = sum(r['deferred'] for r in results)
         
-        print(f"\n📊 ERGEBNIS: {successful}/{len(services)} erfolgreich")
+        self.summary = {'services': processed, 'successful': successful, 'new_events': total_new_events,
+                        'stream_sessions': stream_sessions, 'transponders': progress['groups'], 'deferred': deferred}
+
+        print(f"\n📊 ERGEBNIS: {successful}/{processed} erfolgreich")
+        print(f"📡 {stream_sessions} Stream-Sessions für {progress['groups']} Transponder")
         print(f"🎯 Live-TV blieb ungestört! {total_new_events} neue EPG-Events")
+        if deferred:
+            print(f"⏳ {deferred} Services wegen Zeitbudget aufgeschoben (als 'deferred' in der Status-DB)")
         
         return successful > 0, total_new_events
     
@@ -373,23 +2085,46 @@ class VUStreamEPGRefresher:
         print("="*70)
         print("🎯 Stream-Methode: Live-TV ungestört!")
         print(f"📺 Bouquet: {bouquet_name}")
+        if self.budget:
+            print(f"⏳ Zeitbudget: {self.budget:.0f}s")
         print()
+
+        # Budget zählt ab Start inkl. Analyse
+        self._deadline = time.monotonic() + self.budget if self.budget else None
         
-        # Services ohne EPG finden
-        services_to_refresh = self.find_services_without_epg(bouquet_name, max_events=max_events)
-        
-        if not services_to_refresh:
-            print("🎉 Alle Services haben bereits EPG-Daten!")
-            return True
+        # Pipeline: Analyse liefert Services einzeln, Streams starten sofort (nur ohne Bestätigung).
+        # Mit Budget braucht der Planer alle Services vorab → keine Pipeline
+        if self.force_mode and self.pipeline and not self.budget:
+            services_to_refresh = self.iter_services_without_epg(bouquet_name, max_events=max_events)
+            if self.debug_mode:
+                services_to_refresh = itertools.islice(services_to_refresh, 2)
+        else:
+            # Services ohne EPG finden
+            services_to_refresh = self.find_services_without_epg(bouquet_name, max_events=max_events)
+            
+            if not services_to_refresh:
+                print("🎉 Alle Services haben bereits EPG-Daten!")
+                return True
+
+            # Wertvollste Transponder zuerst (EPG-Lücke pro erwarteter Sekunde)
+            if self.budget:
+                services_to_refresh = self.plan_by_value(services_to_refresh, duration)
         
         # Bestätigung (nur wenn nicht --force)
         if not self.force_mode:
-            total_time = len(services_to_refresh) * (duration + 0.5)
+            groups = self.plan_transponder_groups(services_to_refresh)
+            workers = min(self.resolve_workers(), len(groups))
+            total_time = -(-len(groups) // workers) * (duration + 0.5)
             print(f"\n💡 INFO:")
             print(f"  • {len(services_to_refresh)} Services brauchen Refresh")
-            print(f"  • {duration}s pro Service")  
+            print(f"  • {len(groups)} Transponder = {len(groups)} Streams")
+            print(f"  • {workers} Worker parallel")
+            print(f"  • {duration}s pro Stream")  
             print(f"  • ~{total_time:.0f}s Gesamtzeit")
+            if self.budget and total_time > self.budget:
+                print(f"  • ⏳ Budget {self.budget:.0f}s - Rest wird aufgeschoben")
             
+            prompt_start = time.monotonic()
             try:
                 confirm = input(f"\n🚀 Stream-Refresh starten? (j/N): ").strip().lower()
                 if confirm not in ['j', 'ja', 'y', 'yes']:
@@ -398,6 +2133,9 @@ class VUStreamEPGRefresher:
             except:
                 print("❌ Abgebrochen")
                 return False
+            # Wartezeit an der Bestätigung zählt nicht zum Budget
+            if self._deadline is not None:
+                self._deadline += time.monotonic() - prompt_start
         
         # Stream-Refresh durchführen
         success, new_events = self.stream_based_epg_refresh(services_to_refresh, duration)
@@ -409,22 +2147,392 @@ class VUStreamEPGRefresher:
             print(f"\n💥 Stream-EPG-Refresh fehlgeschlagen")
             return False
 
+class EPGDaemon:
+    """Dauerbetrieb: jeder Transponder wird kurz bevor sein EPG ausläuft refresht (asyncio)
+
+    Die Warteschlange ist ein Heap aus (fällig, Transponder). Fällig ist das Ende der kürzesten
+    EPG-Abdeckung eines Transponders minus `min_horizon_hours` des Refreshers (Standard:
+    LEAD_HOURS). Höchstens so viele Transponder wie Worker laufen gleichzeitig, während einer
+    Aufnahme oder im Standby wird nicht gestreamt. Bouquets und EPG-Abdeckung werden alle
+    RESCAN_HOURS neu eingelesen.
+    """
+    LEAD_HOURS = 6          # So lange vor Ende der EPG-Abdeckung wird refresht
+    RESCAN_HOURS = 6        # Bouquets und Bulk-EPG regelmäßig neu einlesen
+    RETRY_INTERVAL = 3600   # Frühester neuer Versuch nach einem Refresh ohne ausreichend EPG
+    BUSY_BACKOFF = 300      # Pause solange die Box aufnimmt oder im Standby ist
+    MAX_SLEEP = 60          # Spätestens dann wird die Warteschlange erneut geprüft
+
+    def __init__(self, refresher, bouquet_name, duration=4.0, xmltv_path=None, report_path=None, prometheus_path=None):
+        self.refresher = refresher
+        self.bouquet_name = bouquet_name
+        self.duration = duration
+        self.xmltv_path = xmltv_path
+        # Report/Prometheus brauchen refresher.metrics (RunMetrics) - Summen seit Daemon-Start
+        self.report_path = report_path
+        self.prometheus_path = prometheus_path
+        self.summary = {'services': 0, 'successful': 0, 'new_events': 0, 'stream_sessions': 0, 'transponders': 0, 'deferred': 0}
+        if not refresher.min_horizon_hours:
+            refresher.min_horizon_hours = self.LEAD_HOURS
+        self.lead = refresher.min_horizon_hours * 3600
+        self._groups = {}       # Transponder → [(ref, name)]
+        self._queue = []        # Heap (fällig, Nummer, Transponder)
+        self._due = {}          # Transponder → aktuell gültiger Eintrag im Heap
+        self._counter = itertools.count()
+        self._in_flight = set()
+        self._tasks = set()
+        self._save_lock = threading.Lock()
+
+    def _schedule(self, key, due):
+        """Transponder (neu) einplanen - ältere Heap-Einträge werden beim Entnehmen verworfen"""
+        self._due[key] = due
+        heapq.heappush(self._queue, (due, next(self._counter), key))
+
+    def _peek(self):
+        """Nächster fälliger Transponder (fällig, key) oder None"""
+        while self._queue:
+            due, _, key = self._queue[0]
+            if self._due.get(key) == due and key in self._groups and key not in self._in_flight:
+                return due, key
+            heapq.heappop(self._queue)
+        return None
+
+    def _next_due(self, services, horizons, now):
+        """Fälligkeit eines Transponders aus der kürzesten Abdeckung (ohne EPG = sofort)"""
+        return min((horizons.get(_canonical_ref(ref)) or now + self.lead) - self.lead for ref, _ in services)
+
+    def scan(self):
+        """Bouquets und EPG-Abdeckung einlesen - {Transponder: (fällig, [(ref, name)])}
+
+        None wenn die Box nicht erreichbar ist oder ein Bouquet nicht geladen werden konnte.
+        """
+        r = self.refresher
+        now = time.time()
+        groups = {}
+        horizons = {}
+        bouquets = r._find_bouquets(_split_bouquet_names(self.bouquet_name))
+        if not bouquets:
+            return None
+        for bouquet_ref, _ in bouquets:
+            services = r._bouquet_services(bouquet_ref)
+            if services is None:
+                return None
+            # Mit min_horizon_hours liefert die Bulk-Abfrage die volle Abdeckung (epgmulti)
+            counts = r._bulk_epg_counts(bouquet_ref) if r.bulk_check else None
+            for ref, name in services:
+                if not ref.startswith('1:0:') or name == "<n/a>":
+                    continue
+                if any(skip_string.lower() in name.lower() for skip_string in r.skip_strings):
+                    continue
+                key = _transponder_key(ref) if r.transponder_dedup else None
+                canonical_ref = _canonical_ref(ref)
+                group = groups.setdefault(key or canonical_ref, {})
+                if canonical_ref in group:
+                    continue
+                group[canonical_ref] = (ref, name)
+                if key is not None:
+                    r._transponder_sids.setdefault(key, set()).add(_service_id(ref))
+                if r.harvest is not None:
+                    r.harvest.add_channel(ref, name)
+                if counts is not None and counts.get(canonical_ref, {}).get('horizon'):
+                    horizons[canonical_ref] = counts[canonical_ref]['horizon']
+
+        if r.topology is not None:
+            try:
+                r.topology.save()
+            except Exception as e:
+                print(f"  ⚠️ Topologie-Cache nicht gespeichert: {e}")
+
+        plan = {}
+        for key, group in groups.items():
+            services = list(group.values())
+            plan[key] = (self._next_due(services, horizons, now), services)
+        return plan
+
+    def refresh_transponder(self, key, services):
+        """EPG eines Transponders frisch prüfen und bei Bedarf streamen - gibt die nächste Fälligkeit zurück"""
+        r = self.refresher
+        now = time.time()
+        min_horizon = now + self.lead
+        horizons = {}
+        needy = []
+        for ref, name in services:
+            # Tote Services, Backoff und bekannte Abdeckung aus der Status-DB - erst danach wieder prüfen
+            if r._incremental_skip_reason(ref):
+                state = r.state_db.get(r.host, ref)
+                horizons[_canonical_ref(ref)] = max(state['horizon'] or 0, (state['next_attempt'] or 0) + self.lead)
+                continue
+            # Die Box kann das EPG inzwischen selbst geladen haben (z.B. Live-TV auf dem Transponder)
+            epg = r._check_epg_events(ref, limit=0, min_horizon=min_horizon, service={'ref': ref, 'name': name})
+            if epg['success'] and (epg['horizon'] or 0) >= min_horizon:
+                horizons[_canonical_ref(ref)] = epg['horizon']
+            else:
+                needy.append({'ref': ref, 'name': name, 'events': epg['events'], 'horizon': epg['horizon']})
+
+        if needy:
+            print(f"\n🔄 Transponder {key}: {len(needy)}/{len(services)} Services brauchen EPG")
+            group = {'key': key, 'services': needy, 'queue': list(needy), 'done': False, 'streamed': False}
+            progress = {'position': 0, 'total': len(needy), 'groups': 1}
+            result = r._refresh_group(group, self.duration, progress)
+            with self._save_lock:
+                for name, value in result.items():
+                    self.summary[name] += value
+                self.summary['services'] += len(needy)
+                self.summary['transponders'] += 1
+            for service in needy:
+                horizons[_canonical_ref(service['ref'])] = service.get('horizon')
+            self.save()
+
+        # Reicht die Abdeckung trotz Refresh nicht, frühestens nach RETRY_INTERVAL erneut versuchen
+        return max(self._next_due(services, horizons, now), now + self.RETRY_INTERVAL)
+
+    def save(self):
+        """Gelernte Statistik, XMLTV, Report und Prometheus-Datei nach jedem Refresh schreiben"""
+        r = self.refresher
+        with self._save_lock:
+            try:
+                if r.stats is not None:
+                    r.stats.save()
+                if self.xmltv_path and r.harvest is not None:
+                    r.harvest.write_xmltv(self.xmltv_path)
+                if r.metrics is not None:
+                    r.metrics.finish(self.summary)
+                    if self.report_path:
+                        write_run_report(self.report_path, [r.metrics])
+                    if self.prometheus_path:
+                        write_prometheus_textfile(self.prometheus_path, [r.metrics])
+            except Exception as e:
+                print(f"  ⚠️ Speichern fehlgeschlagen: {e}")
+
+    async def _refresh(self, key, slots, executor):
+        """Ein Transponder im Worker-Thread, danach wieder einplanen"""
+        loop = asyncio.get_event_loop()
+        try:
+            due = await loop.run_in_executor(executor, _with_output_label(self.refresh_transponder), key, list(self._groups[key]))
+        except Exception as e:
+            print(f"  ❌ Transponder {key}: {e}")
+            due = time.time() + self.RETRY_INTERVAL
+        finally:
+            self._in_flight.discard(key)
+            slots.release()
+        if key in self._groups:
+            self._schedule(key, due)
+            if self.refresher.debug_mode:
+                print(f"  🗓️ {key} wieder fällig: {datetime.fromtimestamp(due).strftime('%d.%m. %H:%M')}")
+
+    async def _main(self, executor, workers):
+        loop = asyncio.get_event_loop()
+        slots = asyncio.Semaphore(workers)
+        next_scan = 0
+        busy = None
+
+        while True:
+            now = time.time()
+            if now >= next_scan:
+                try:
+                    plan = await loop.run_in_executor(executor, _with_output_label(self.scan))
+                except Exception as e:
+                    print(f"  ❌ Scan-Fehler: {e}")
+                    plan = None
+                if plan is None:
+                    # Bisherigen Plan behalten, Scan bald wiederholen
+                    print(f"⚠️ Bouquets nicht lesbar - bisheriger Plan bleibt, neuer Versuch in {self.BUSY_BACKOFF // 60} Minuten")
+                    next_scan = time.time() + self.BUSY_BACKOFF
+                    continue
+                self._groups = {key: services for key, (_, services) in plan.items()}
+                for key, (due, _) in plan.items():
+                    if key not in self._in_flight:
+                        self._schedule(key, due)
+                next_scan = time.time() + self.RESCAN_HOURS * 3600
+                overdue = sum(1 for due, _ in plan.values() if due <= time.time())
+                print(f"🗓️ {len(plan)} Transponder eingeplant, {overdue} sofort fällig ({workers} Worker)")
+                continue
+
+            head = self._peek()
+            if head is None or head[0] > now:
+                wake = min(next_scan, head[0]) if head is not None else next_scan
+                await asyncio.sleep(max(0.0, min(wake - now, self.MAX_SLEEP)))
+                continue
+
+            # Während Aufnahme oder Standby keinen Tuner belegen
+            reason = await loop.run_in_executor(executor, _with_output_label(self.refresher.box_busy))
+            if reason != busy:
+                print(f"⏸️ Pausiert: {reason}" if reason else "▶️ Box wieder frei")
+                busy = reason
+            if reason:
+                await asyncio.sleep(self.BUSY_BACKOFF)
+                continue
+
+            await slots.acquire()
+            head = self._peek()
+            if head is None or head[0] > time.time():
+                slots.release()
+                continue
+            key = head[1]
+            self._in_flight.add(key)
+            task = asyncio.ensure_future(self._refresh(key, slots, executor))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def run(self):
+        """Läuft bis Ctrl+C"""
+        print("="*70)
+        print(f"VU+ STREAM EPG DAEMON - Refresh {self.lead / 3600:.0f}h vor Ende der EPG-Abdeckung")
+        print("="*70)
+        print(f"📺 Bouquet: {self.bouquet_name}")
+        print(f"🎯 Sweet Spot: {self.duration}s pro Stream")
+        print()
+
+        # Ein Thread mehr als Worker für Bouquet-Scan und Standby/Aufnahme-Prüfung
+        workers = self.refresher.resolve_workers()
+        executor = ThreadPoolExecutor(max_workers=workers + 1)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main(executor, workers))
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            if self._tasks:
+                loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+            loop.close()
+            executor.shutdown(wait=False)
+            self.save()
+
+def load_receivers(path):
+    """Receiver aus einer INI-Datei laden - eine Sektion pro Box, [DEFAULT] gilt für alle
+
+    Schlüssel: host (Pflicht), bouquet (Pflicht, kommagetrennt oder 'all'), port, username, password, skip,
+    workers, duration, max_events. Nicht gesetzte Werte kommen von der Kommandozeile.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    with open(path, encoding='utf-8') as f:
+        parser.read_file(f)
+
+    receivers = []
+    for section in parser.sections():
+        box = parser[section]
+        if not box.get('host', '').strip() or not box.get('bouquet', '').strip():
+            raise ValueError(f"[{section}]: host und bouquet sind Pflicht")
+
+        workers = box.get('workers', '').strip() or None
+        if workers is not None and workers != 'auto':
+            workers = int(workers)
+            if workers < 1:
+                raise ValueError(f"[{section}]: ungültige Worker-Anzahl {workers}")
+
+        receivers.append({
+            'name': section,
+            'host': box['host'].strip(),
+            'port': box.getint('port', fallback=80),
+            'username': box.get('username') or None,
+            'password': box.get('password') or None,
+            'bouquet': box['bouquet'].strip(),
+            'skip': [s.strip() for s in box.get('skip', '').split(',') if s.strip()],
+            'workers': workers,
+            'duration': box.getfloat('duration', fallback=None),
+            'max_events': box.getint('max_events', fallback=None),
+        })
+    if not receivers:
+        raise ValueError("keine Receiver-Sektion gefunden")
+    return receivers
+
+def run_receivers(receivers, options, duration=4.0, max_events=0, metrics_list=None):
+    """Alle Receiver gleichzeitig refreshen - die Gesamtdauer entspricht der langsamsten Box
+
+    `options` sind die gemeinsamen VUStreamEPGRefresher-Parameter (Status-DB und gelernte
+    Statistik werden geteilt), die Werte aus der Receiver-Konfiguration haben Vorrang.
+    Mit `metrics_list` wird pro Receiver ein RunMetrics angelegt und dort angehängt.
+    """
+    def refresh(box):
+        _set_output_label(box['name'])
+        kwargs = dict(options, force_mode=True, port=box['port'])
+        if metrics_list is not None:
+            kwargs['metrics'] = RunMetrics(box['host'], label=box['name'])
+            metrics_list.append(kwargs['metrics'])
+        kwargs['skip_strings'] = list(options.get('skip_strings', [])) + box['skip']
+        for key in ('username', 'password', 'workers'):
+            if box[key] is not None:
+                kwargs[key] = box[key]
+
+        refresher = VUStreamEPGRefresher(box['host'], **kwargs)
+        box_start = time.monotonic()
+        try:
+            success = refresher.run(box['bouquet'], box['duration'] or duration,
+                                    max_events=box['max_events'] if box['max_events'] is not None else max_events)
+        except Exception as e:
+            print(f"❌ Fehler: {e}")
+            success = False
+        if refresher.metrics is not None:
+            refresher.metrics.finish(refresher.summary)
+        return dict(refresher.summary, success=success, elapsed=time.monotonic() - box_start)
+
+    start_time = time.monotonic()
+    stdout = sys.stdout
+    sys.stdout = LabeledOutput(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=len(receivers)) as executor:
+            results = list(executor.map(refresh, receivers))
+    finally:
+        sys.stdout = stdout
+    elapsed = time.monotonic() - start_time
+
+    print("\n" + "="*70)
+    print(f"📊 GESAMT: {len(receivers)} Receiver")
+    print("="*70)
+    for box, result in zip(receivers, results):
+        icon = '✅' if result['success'] else '💥'
+        print(f"{icon} {box['name']:<15} {box['host']:<16} {result['successful']}/{result['services']} erfolgreich, "
+              f"{result['stream_sessions']} Streams, {result['new_events']} neue Events, {result['elapsed']:.0f}s")
+    print(f"📡 {sum(r['stream_sessions'] for r in results)} Stream-Sessions, "
+          f"{sum(r['new_events'] for r in results)} neue EPG-Events")
+    print(f"⏱️ Gesamtzeit {elapsed:.0f}s (nacheinander: {sum(r['elapsed'] for r in results):.0f}s)")
+
+    return all(result['success'] for result in results)
+
 def main():
     # Einfache Parameter-Parsing ohne argparse
-    if len(sys.argv) < 4:
+    config_path = next((arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--config=')), None)
+    if len(sys.argv) < 4 and not config_path:
         print("VU+ Stream EPG Refresher - Minimal Version")
         print("="*50)
         print("🌊 Stream-Methode: Kein Zapping → Live-TV ungestört")
         print()
         print("Usage:")
-        print("  python vu_stream_epg.py <IP> bouquet <name> [--duration=X] [--max_events=Y] [--username=U] [--password=P] [--skip=\"A,B\"] [--force]")
+        print("  python vu_stream_epg.py <IP> bouquet <name> [Parameter]")
+        print("  python vu_stream_epg.py <IP> daemon <name> [Parameter]")
+        print("  python vu_stream_epg.py --config=receivers.ini [Parameter]")
+        print("  <name> darf mehrere Bouquets kommagetrennt enthalten oder 'all' für alle Bouquets")
         print()
         print("Parameter:")
-        print("  --duration=X     Stream-Duration in Sekunden (0.5-30.0, Standard: 4.0)")
+        print("  --duration=X     Max. Stream-Duration in Sekunden (0.5-30.0, Standard: 4.0)")
         print("  --max_events=Y   Min. EPG-Events für Refresh (Standard: 0 = alle ohne EPG)")
         print("  --username=USER  HTTP Basic Auth Benutzername")  
         print("  --password=PASS  HTTP Basic Auth Passwort")
         print("  --skip=\"A,B,C\"    Kanäle überspringen, kommagetrennte Liste")
+        print("  --no-dedup       Jeden Service streamen (kein Transponder-Dedup)")
+        print("  --no-bulk        EPG pro Service prüfen statt bouquet-weit")
+        print("  --no-sniff       Immer volle Duration streamen (kein EIT-Frühabbruch)")
+        print("  --poll[=S]       EPG alle S Sekunden während des Streams prüfen (Standard: 0.5)")
+        print("  --no-pipeline    Erst komplette Analyse, dann Streams (mit --force sonst überlappend)")
+        print("  --workers=N      Parallele Streams (Standard: 1, auto = Tuner - 1)")
+        print("  --rate-limit=KB  Max. Empfangsrate pro Stream in KB/s (Standard: unbegrenzt)")
+        print("  --connect-timeout=S     Timeout für den Verbindungsaufbau zum Stream (Standard: 3.0)")
+        print("  --first-byte-timeout=S  Max. Wartezeit auf die ersten Stream-Daten (Standard: 5.0)")
+        print("  --state=FILE     Status-DB für inkrementelle Läufe (Standard: vu_stream_epgrefresh.db)")
+        print("  --no-state       Keine Status-DB verwenden")
+        print("  --since-hours=H  Services mit erfolgreichem Refresh in den letzten H Stunden auslassen")
+        print("  --min-horizon-hours=H  Refresh nur wenn EPG weniger als H Stunden in die Zukunft reicht (daemon: Standard 6)")
+        print("  --dead-ttl=H     Tote Services (verschlüsselt, keine Daten) H Stunden auslassen (Standard: 24, 0 = aus)")
+        print("  --stats=FILE     Gelernte Duration pro Transponder (Standard: vu_stream_epgrefresh_stats.json)")
+        print("  --no-learn       Immer --duration verwenden (nichts lernen)")
+        print("  --topology=FILE  Cache für Bouquets/Services (Standard: vu_stream_epgrefresh_topology.json)")
+        print("  --topology-ttl=H Gecachte Service-Listen H Stunden ungeprüft verwenden (Standard: 6, 0 = immer prüfen)")
+        print("  --no-topology    Bouquets und Services bei jedem Lauf neu laden und parsen")
+        print("  --budget=S       Zeitbudget in Sekunden: wertvollste Transponder zuerst, Rest aufschieben")
+        print("  --xmltv=FILE     EPG aus den Streams als XMLTV schreiben (bestehende Datei wird gemergt)")
+        print("  --report=FILE    JSON-Report mit Zeitmessungen pro Phase und Service schreiben")
+        print("  --prometheus=FILE  Metriken für den node_exporter Textfile-Collector (*.prom)")
+        print("  --config=FILE    Mehrere Receiver gleichzeitig (INI: eine Sektion pro Box mit host, bouquet, ...)")
         print("  --force          Ohne Bestätigung ausführen")
         print("  --debug          Debug-Ausgabe aktivieren")
         print()
@@ -436,20 +2544,49 @@ def main():
         print("  python vu_stream_epg.py 192.168.178.39 bouquet MyTV --duration=2.0 --max_events=3 --force")
         print("  python vu_stream_epg.py 192.168.178.39 bouquet MyTV --username=admin --password=secret")
         print("  python vu_stream_epg.py 192.168.178.39 bouquet MyTV --username=user --password=pass --skip=\"Sky Sport\"")
+        print("  python vu_stream_epg.py 192.168.178.39 bouquet MyTV --workers=auto --force")
+        print("  python vu_stream_epg.py 192.168.178.39 bouquet \"Favourites,HD,Sky\" --force")
+        print("  python vu_stream_epg.py 192.168.178.39 bouquet all --force")
+        print("  python vu_stream_epg.py 192.168.178.39 bouquet MyTV --since-hours=12 --min-horizon-hours=24 --force")
+        print("  python vu_stream_epg.py --config=receivers.ini --since-hours=12 --force")
+        print("  python vu_stream_epg.py 192.168.178.39 daemon all --workers=auto --min-horizon-hours=12")
         return
     
-    host = sys.argv[1]
-    mode = sys.argv[2]  # sollte "bouquet" sein
-    name = sys.argv[3]
+    if config_path:
+        host = mode = name = None
+    else:
+        host = sys.argv[1]
+        mode = sys.argv[2]  # "bouquet" oder "daemon"
+        name = sys.argv[3]
     
     # Parameter
     force_mode = '--force' in sys.argv
     debug_mode = '--debug' in sys.argv
+    transponder_dedup = '--no-dedup' not in sys.argv
+    bulk_check = '--no-bulk' not in sys.argv
+    eit_sniff = '--no-sniff' not in sys.argv
+    pipeline = '--no-pipeline' not in sys.argv
     duration = 4.0
     max_events = 0
+    workers = 1
+    poll_interval = 0.5 if '--poll' in sys.argv else None
     skip_strings = []  # Liste der Skip-Strings
     username = None
     password = None
+    rate_limit = None
+    report_path = None
+    prometheus_path = None
+    budget = None
+    xmltv_path = None
+    connect_timeout = VUStreamEPGRefresher.CONNECT_TIMEOUT
+    first_byte_timeout = VUStreamEPGRefresher.FIRST_BYTE_TIMEOUT
+    dead_ttl_hours = RefreshStateDB.DEAD_TTL / 3600
+    state_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vu_stream_epgrefresh.db')
+    since_hours = None
+    min_horizon_hours = None
+    stats_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vu_stream_epgrefresh_stats.json')
+    topology_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vu_stream_epgrefresh_topology.json')
+    topology_ttl_hours = TopologyCache.TTL_HOURS
 
     # Duration aus --duration=X extrahieren
     for arg in sys.argv:
@@ -467,6 +2604,82 @@ def main():
                 max_events = int(arg.split('=')[1])
             except:
                 print(f"❌ Ungültige max_events: {arg}")
+        if arg.startswith('--poll='):
+            try:
+                poll_interval = float(arg.split('=')[1])
+                if poll_interval <= 0:
+                    raise ValueError
+            except:
+                print(f"❌ Ungültiges Poll-Intervall: {arg}")
+                return
+        if arg.startswith('--rate-limit='):
+            try:
+                rate_limit = float(arg.split('=')[1])
+                if rate_limit <= 0:
+                    raise ValueError
+            except:
+                print(f"❌ Ungültiges Rate-Limit: {arg}")
+                return
+        if arg.startswith('--connect-timeout=') or arg.startswith('--first-byte-timeout='):
+            try:
+                seconds = float(arg.split('=')[1])
+                if seconds <= 0:
+                    raise ValueError
+            except:
+                print(f"❌ Ungültiges Timeout: {arg}")
+                return
+            if arg.startswith('--connect-timeout='):
+                connect_timeout = seconds
+            else:
+                first_byte_timeout = seconds
+        if arg.startswith('--budget='):
+            try:
+                budget = float(arg.split('=')[1])
+                if budget <= 0:
+                    raise ValueError
+            except:
+                print(f"❌ Ungültiges Budget: {arg}")
+                return
+        if arg.startswith('--xmltv='):
+            xmltv_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--report='):
+            report_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--prometheus='):
+            prometheus_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--state='):
+            state_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--stats='):
+            stats_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--topology='):
+            topology_path = arg.split('=', 1)[1] or None
+        if arg.startswith('--since-hours=') or arg.startswith('--min-horizon-hours=') or arg.startswith('--dead-ttl=') or arg.startswith('--topology-ttl='):
+            try:
+                hours = float(arg.split('=')[1])
+                if hours < 0:
+                    raise ValueError
+            except:
+                print(f"❌ Ungültige Stunden-Angabe: {arg}")
+                return
+            if arg.startswith('--since-hours='):
+                since_hours = hours
+            elif arg.startswith('--dead-ttl='):
+                dead_ttl_hours = hours
+            elif arg.startswith('--topology-ttl='):
+                topology_ttl_hours = hours
+            else:
+                min_horizon_hours = hours
+        if arg.startswith('--workers='):
+            value = arg.split('=')[1]
+            if value == 'auto':
+                workers = 'auto'
+            else:
+                try:
+                    workers = int(value)
+                    if workers < 1:
+                        raise ValueError
+                except:
+                    print(f"❌ Ungültige Worker-Anzahl: {arg}")
+                    return
         # Skip-Parameter parsing
         if arg.startswith('--skip='):
             try:
@@ -488,24 +2701,91 @@ def main():
     print(f"🎯 Sweet Spot: {duration}s")
     print(f"🎯 Max. Events: {max_events}")
 
-    refresher = VUStreamEPGRefresher(host, username=username, password=password, force_mode=force_mode, debug_mode=debug_mode, skip_strings=skip_strings)
+    # Status-DB ist optional - ohne sie läuft alles wie bisher
+    state_db = None
+    if state_path and '--no-state' not in sys.argv:
+        try:
+            state_db = RefreshStateDB(state_path, dead_ttl=dead_ttl_hours * 3600)
+        except Exception as e:
+            print(f"⚠️ Status-DB nicht verfügbar ({e}) - ohne inkrementellen Modus")
+
+    stats = TransponderStats(stats_path) if stats_path and '--no-learn' not in sys.argv else None
+    topology = TopologyCache(topology_path, ttl_hours=topology_ttl_hours) if topology_path and '--no-topology' not in sys.argv else None
+
+    options = dict(username=username, password=password, force_mode=force_mode, debug_mode=debug_mode, skip_strings=skip_strings, transponder_dedup=transponder_dedup, workers=workers, bulk_check=bulk_check, eit_sniff=eit_sniff, poll_interval=poll_interval,
+                   state_db=state_db, since_hours=since_hours, min_horizon_hours=min_horizon_hours, stats=stats, pipeline=pipeline, rate_limit=rate_limit,
+                   connect_timeout=connect_timeout, first_byte_timeout=first_byte_timeout, budget=budget,
+                   harvest=EITHarvest() if xmltv_path else None, topology=topology)
     
+    # Metriken nur sammeln, wenn sie auch geschrieben werden
+    metrics_list = [] if report_path or prometheus_path else None
+
     try:
-        if mode == 'bouquet':
+        if config_path:
+            try:
+                receivers = load_receivers(config_path)
+            except Exception as e:
+                print(f"❌ Receiver-Konfiguration ungültig: {e}")
+                return
+
+            print(f"🖥️ {len(receivers)} Receiver: " + ", ".join(f"{box['name']} ({box['host']})" for box in receivers))
+            if not force_mode:
+                try:
+                    confirm = input(f"\n🚀 Stream-Refresh auf allen Receivern starten? (j/N): ").strip().lower()
+                except:
+                    confirm = ''
+                if confirm not in ['j', 'ja', 'y', 'yes']:
+                    print("❌ Abgebrochen")
+                    return
+            success = run_receivers(receivers, options, duration, max_events=max_events, metrics_list=metrics_list)
+        elif mode == 'bouquet':
+            metrics = RunMetrics(host) if metrics_list is not None else None
+            refresher = VUStreamEPGRefresher(host, metrics=metrics, **options)
             success = refresher.run(name, duration, max_events=max_events)
+            if metrics is not None:
+                metrics.finish(refresher.summary)
+                metrics_list.append(metrics)
+        elif mode == 'daemon':
+            # Dauerbetrieb bis Ctrl+C - Refresh kurz vor Ende der EPG-Abdeckung statt einmal nachts
+            metrics = RunMetrics(host) if metrics_list is not None else None
+            refresher = VUStreamEPGRefresher(host, metrics=metrics, **options)
+            EPGDaemon(refresher, name, duration, xmltv_path=xmltv_path,
+                      report_path=report_path, prometheus_path=prometheus_path).run()
+            success = True
         else:
-            print(f"❌ Mode '{mode}' nicht unterstützt (nur 'bouquet')")
+            print(f"❌ Mode '{mode}' nicht unterstützt (nur 'bouquet' und 'daemon')")
             success = False
         
         if success:
             print(f"\n🎉 EPG-Refresh erfolgreich!")
         else:
             print(f"\n💥 EPG-Refresh fehlgeschlagen")
+
+        if xmltv_path:
+            try:
+                programmes = options['harvest'].write_xmltv(xmltv_path)
+                print(f"📺 XMLTV: {xmltv_path} ({options['harvest'].programme_count()} neue, {programmes} Sendungen gesamt)")
+            except Exception as e:
+                print(f"⚠️ XMLTV konnte nicht geschrieben werden: {e}")
+
+        if metrics_list:
+            try:
+                if report_path:
+                    write_run_report(report_path, metrics_list)
+                    print(f"📄 Report: {report_path}")
+                if prometheus_path:
+                    write_prometheus_textfile(prometheus_path, metrics_list)
+                    print(f"📈 Prometheus: {prometheus_path}")
+            except Exception as e:
+                print(f"⚠️ Metriken konnten nicht geschrieben werden: {e}")
             
     except KeyboardInterrupt:
         print(f"\n⚠️ Unterbrochen!")
     except Exception as e:
         print(f"❌ Fehler: {e}")
+    finally:
+        if state_db is not None:
+            state_db.close()
 
 if __name__ == "__main__":
     main()